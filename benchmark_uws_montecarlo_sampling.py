@@ -0,0 +1,76 @@
+import time
+import pandas as pd, numpy as np
+import data_processing as dp
+import matplotlib.pyplot as plt
+
+# Compare the convergence of pseudo-random and quasi-random (Sobol, Latin
+# hypercube) Monte Carlo estimates of RMSE_pH_TA_tCO2 on the SO279 subsamples
+
+# Load data
+subsamples = pd.read_csv("./data/processing/processed_vindta_subsamples.csv")
+
+# Import RMSE for TALK and tco2 based on NUTS analysis
+talk_rmse = 1.1792962721848792
+tco2_rmse = 2.1070920505299284
+
+def pH_TA_tCO2(talk, tco2, salinity, temperature):
+    """pH (total scale) from TA and DIC at in-situ temperature."""
+    return dp.co2sys(
+        par1=talk,
+        par2=tco2,
+        par1_type=1,
+        par2_type=2,
+        opt_pH_scale=1,
+        salinity=salinity,
+        temperature=temperature,
+        outputs=['pH_total'],
+    )['pH_total']
+
+inputs = {
+    'talk': subsamples['talk'].to_numpy(),
+    'tco2': subsamples['tco2'].to_numpy(),
+    'salinity': subsamples['salinity'].to_numpy(),
+    'temperature': subsamples['temperature'].to_numpy(),
+}
+uncertainties = {'talk': talk_rmse, 'tco2': tco2_rmse}
+
+# Precision of each estimate: spread of the RMSE between independent
+# repeats, relative to its mean, median over all subsamples
+samplers = ['random', 'sobol', 'lhs']
+iterations = 2**np.arange(4, 11)
+n_repeats = 10
+
+results = []
+for sampler in samplers:
+    for n_iterations in iterations:
+        estimates = []
+        start = time.perf_counter()
+        for seed in range(n_repeats):
+            np.random.seed(seed)
+            estimates.append(dp.monte_carlo_uncertainty(
+                pH_TA_tCO2, inputs, uncertainties, n_iterations=n_iterations,
+                block_size=n_iterations, sampler=sampler, seed=seed))
+        elapsed = (time.perf_counter() - start) / n_repeats
+        estimates = np.array(estimates)
+        relative_spread = np.nanmedian(estimates.std(axis=0) / estimates.mean(axis=0))
+        results.append({'sampler': sampler,
+                        'n_iterations': n_iterations,
+                        'relative_spread': relative_spread,
+                        'seconds': elapsed})
+        print(results[-1])
+
+results = pd.DataFrame(results)
+results.to_csv("./data/processing/benchmark_uws_montecarlo_sampling.csv", index=False)
+
+#%% === Plotting
+fig, ax = plt.subplots(figsize=(6, 4), dpi=300)
+for sampler in samplers:
+    L = results['sampler'] == sampler
+    ax.loglog(results['n_iterations'][L], results['relative_spread'][L], marker='o', label=sampler)
+ax.set_xlabel("Monte Carlo iterations")
+ax.set_ylabel("Relative spread of RMSE$_{pH(TA, DIC)}$")
+ax.grid(alpha=0.3, which='both')
+ax.legend()
+plt.tight_layout()
+plt.savefig("./figs/benchmark_uws_montecarlo_sampling.png")
+plt.show()
@@ -1,7 +1,36 @@
 from .initools.read_pyrosci import read_pyrosci
 from .initools.logbook import logbook
 from .initools.smb import smb
+from .initools.smb_store import convert_smb
+from .initools.smb_store import read_smb_store
+from .initools.smb_store import smb_store_current
+from .initools.ctd import read_ctd
+from .initools.nutrients import read_nutrients
 from .salinity import salinity
+from .salinity import IncrementalSalinity
 from .alkalinity import alkalinity
+from .co2sys import co2sys
+from .calibration import CalibrationCurve
+from .calibration import cross_validate
+from .stabilisation import transient_mask
+from .qc import hampel_flags
+from .samples import parse_sample_names
+from .samples import sample_key
+from .stations import read_stations
+from .stations import join_stations
+from .export import UWS_PRECISION
+from .export import write_csv
+from .export import schema_usecols
+from .export import format_frame
+from .export import write_formatted
+from .memory import compact_dtypes
+from .memory import memory_report
+from .rolling import find_gaps
+from .rolling import rolling_stats
+from .uncertainty import monte_carlo_uncertainty
+from .uncertainty import linear_uncertainty
+from .uncertainty import adaptive_monte_carlo
+from .uncertainty import uniform_sampler
+from .uncertainty import sampler_sizes
 from .process import raw_process
 from .process import bgc_process
\ No newline at end of file
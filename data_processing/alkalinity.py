@@ -1,6 +1,7 @@
-import PyCO2SYS as pyco2
+from data_processing import carbonate
+from data_processing.co2sys import co2sys
 
-def alkalinity(data):
+def alkalinity(data, fast=False, lookup=False, cache_dir=None):
     df = data.copy()
     # estimate TA for the North Atlantic Ocean from S and T according to Lee et al. (2006)
     def ta_nao(sss, sst):
@@ -17,16 +18,32 @@ def alkalinity(data):
     df['ta_est'] = ta_nao(df.salinity, df.SBE38_water_temp)
     
     # recalculate pH at in-situ temperature (SBE38) using estimated TA
-    carb_dict = pyco2.sys(df.ta_est, df.pH_cell, 1, 3, 
-                          salinity=df.salinity,
-                          temperature=df.temp_cell,
-                          temperature_out=df.SBE38_water_temp,
-                          pressure=0,
-                          pressure_out=3,
-                          opt_pH_scale=1,
-                          opt_k_carbonic=16,
-                          opt_total_borate=1
-                          )
+    if fast:
+        # specialised NumPy solver for this exact option set (same result
+        # as PyCO2SYS within 1e-6 pH, without computing unused outputs);
+        # lookup interpolates the constants from a T/S table of the cruise
+        df['pH_insitu_ta_est'] = carbonate.pH_total_out(df.ta_est, df.pH_cell,
+                                                        salinity=df.salinity,
+                                                        temperature=df.temp_cell,
+                                                        temperature_out=df.SBE38_water_temp,
+                                                        pressure=0,
+                                                        pressure_out=3,
+                                                        lookup=lookup
+                                                        )
+        return df
+    
+    carb_dict = co2sys(df.ta_est, df.pH_cell, 1, 3, 
+                       outputs=['pH_total_out'],
+                       salinity=df.salinity,
+                       temperature=df.temp_cell,
+                       temperature_out=df.SBE38_water_temp,
+                       pressure=0,
+                       pressure_out=3,
+                       opt_pH_scale=1,
+                       opt_k_carbonic=16,
+                       opt_total_borate=1,
+                       cache_dir=cache_dir
+                       )
     
     # save in-situ pH to df
     df['pH_insitu_ta_est'] = carb_dict['pH_total_out']
@@ -0,0 +1,52 @@
+import os
+import hashlib
+import numpy as np
+
+def cache_key(*args, **kwargs):
+    """Hash positional and keyword arguments (arrays or scalars) into a
+    hex digest usable as a cache file name."""
+    digest = hashlib.sha1()
+    items = [(None, arg) for arg in args] + sorted(kwargs.items())
+    for key, value in items:
+        value = np.asarray(value)
+        if value.dtype == object:
+            value = value.astype(float)
+        digest.update(repr((key, value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    return digest.hexdigest()
+
+def cache_load(cache_dir, key):
+    """Return the dict of arrays stored under key, or None on a miss.
+
+    A hit refreshes the file's modification time, which is what the LRU
+    eviction in cache_save orders on.
+    """
+    fname = os.path.join(cache_dir, key + '.npz')
+    try:
+        with np.load(fname) as stored:
+            results = {name: stored[name] for name in stored.files}
+    except (OSError, ValueError):
+        return None
+    os.utime(fname)
+    return results
+
+def cache_save(cache_dir, key, results, max_bytes=500e6):
+    """Store a dict of arrays under key, then delete least recently used
+    files until the cache directory is no larger than max_bytes."""
+    os.makedirs(cache_dir, exist_ok=True)
+    fname = os.path.join(cache_dir, key + '.npz')
+    # write to a temporary file first so readers never see a partial file
+    tmp_fname = fname[:-4] + '.tmp.npz'
+    np.savez(tmp_fname, **results)
+    os.replace(tmp_fname, fname)
+
+    entries = [os.path.join(cache_dir, file) for file in os.listdir(cache_dir)
+               if file.endswith('.npz') and not file.endswith('.tmp.npz')]
+    entries = sorted(((os.stat(entry), entry) for entry in entries),
+                     key=lambda entry: entry[0].st_mtime)
+    total = sum(stat.st_size for stat, _ in entries)
+    for stat, entry in entries:
+        if total <= max_bytes or entry == fname:
+            continue
+        os.remove(entry)
+        total -= stat.st_size
@@ -0,0 +1,386 @@
+import numpy as np
+
+# Constants and options matching the pyco2.sys call in alkalinity():
+# opt_k_carbonic=16 (Sulpis et al., 2020), opt_pH_scale=1 (total),
+# opt_total_borate=1 (Uppstrom, 1974) and PyCO2SYS defaults otherwise
+# (KSO4 Dickson 1990, KF Dickson & Riley 1979, KB Dickson 1990,
+# KW Millero 1995, pressure corrections Millero 1995, CODATA 2018 gas constant).
+# Nutrients, ammonia and sulfide are zero, as in alkalinity().
+# opt_k_carbonic=10 (Lueker et al., 2000; the PyCO2SYS default) is also
+# available for the uncertainty scripts.
+R_GAS = 83.14462618  # ml bar-1 K-1 mol-1
+T_ZERO = 273.15
+PH_TOLERANCE = 1e-10
+# Newton steps before a row that has not converged is given up as NaN
+MAX_ITERATIONS = 50
+# Constants of constants_table, those the pH solvers use besides the
+# totals, which are linear in salinity
+SOLVER_CONSTANTS = ['k_1', 'k_2', 'k_b', 'k_w', 'k_so4', 'k_f', 'total_to_free']
+# Largest relative error of an interpolated constant accepted by
+# pH_total_out(lookup=True), about 4e-7 in pH
+LOOKUP_RTOL = 1e-6
+# constants_table results for the session
+_TABLES = {}
+
+
+def _pcx(delta_v, kappa, pressure_bar, temp_k):
+    """Pressure correction factor for an equilibrium constant."""
+    return np.exp((-delta_v + 0.5 * kappa * pressure_bar) * pressure_bar / (R_GAS * temp_k))
+
+
+def totals(salinity):
+    """Total borate, sulfate and fluoride in mol/kg-sw from salinity."""
+    total_borate = 0.0004157 * salinity / 35
+    total_sulfate = (0.14 / 96.062) * salinity / 1.80655
+    total_fluoride = (0.000067 / 18.998) * salinity / 1.80655
+    return total_borate, total_sulfate, total_fluoride
+
+
+def constants(salinity, temperature, pressure, opt_k_carbonic=16):
+    """Equilibrium constants on the total pH scale at temperature (degC)
+    and pressure (dbar), with carbonic acid constants of Sulpis et al.
+    (2020, opt_k_carbonic=16) or Lueker et al. (2000, opt_k_carbonic=10)."""
+    temp_k = temperature + T_ZERO
+    log_temp_k = np.log(temp_k)
+    pressure_bar = pressure / 10
+    total_borate, total_sulfate, total_fluoride = totals(salinity)
+    # Bisulfate and fluoride, free scale
+    ion_s = 19.924 * salinity / (1000 - 1.005 * salinity)
+    k_so4_p0 = np.exp(
+        -4276.1 / temp_k
+        + 141.328
+        - 23.093 * log_temp_k
+        + (-13856 / temp_k + 324.57 - 47.986 * log_temp_k) * np.sqrt(ion_s)
+        + (35474 / temp_k - 771.54 + 114.723 * log_temp_k) * ion_s
+        + (-2698 / temp_k) * np.sqrt(ion_s) * ion_s
+        + (1776 / temp_k) * ion_s**2
+    ) * (1 - 0.001005 * salinity)
+    k_f_p0 = np.exp(1590.2 / temp_k - 12.641 + 1.525 * np.sqrt(ion_s)) * (1 - 0.001005 * salinity)
+    k_so4 = k_so4_p0 * _pcx(
+        -18.03 + 0.0466 * temperature + 0.000316 * temperature**2,
+        (-4.53 + 0.09 * temperature) / 1000,
+        pressure_bar, temp_k)
+    k_f = k_f_p0 * _pcx(
+        -9.78 - 0.009 * temperature - 0.000942 * temperature**2,
+        (-3.91 + 0.054 * temperature) / 1000,
+        pressure_bar, temp_k)
+    # pH scale conversion factors
+    sws_to_total_p0 = (1 + total_sulfate / k_so4_p0) / (
+        1 + total_sulfate / k_so4_p0 + total_fluoride / k_f_p0)
+    sws_to_total = (1 + total_sulfate / k_so4) / (
+        1 + total_sulfate / k_so4 + total_fluoride / k_f)
+    total_to_free = 1 / (1 + total_sulfate / k_so4)
+    # Boric acid
+    sqrt_sal = np.sqrt(salinity)
+    k_b = np.exp(
+        (-8966.9 - 2890.53 * sqrt_sal - 77.942 * salinity
+         + 1.728 * sqrt_sal * salinity - 0.0996 * salinity**2) / temp_k
+        + 148.0248
+        + 137.1942 * sqrt_sal
+        + 1.62142 * salinity
+        + (-24.4344 - 25.085 * sqrt_sal - 0.2474 * salinity) * log_temp_k
+        + 0.053105 * sqrt_sal * temp_k
+    ) / sws_to_total_p0
+    k_b = k_b * _pcx(
+        -29.48 + 0.1622 * temperature - 0.002608 * temperature**2,
+        -2.84 / 1000,
+        pressure_bar, temp_k) * sws_to_total
+    # Water
+    k_w = np.exp(
+        148.9802
+        - 13847.26 / temp_k
+        - 23.6521 * log_temp_k
+        + (-5.977 + 118.67 / temp_k + 1.0495 * log_temp_k) * sqrt_sal
+        - 0.01615 * salinity
+    )
+    k_w = k_w * _pcx(
+        -20.02 + 0.1119 * temperature - 0.001409 * temperature**2,
+        (-5.13 + 0.0794 * temperature) / 1000,
+        pressure_bar, temp_k) * sws_to_total
+    # Carbonic acid
+    if opt_k_carbonic == 16:
+        pk_1 = (8510.63 / temp_k - 172.4493 + 26.32996 * log_temp_k
+                - 0.011555 * salinity + 0.0001152 * salinity**2)
+        pk_2 = (4226.23 / temp_k - 59.4636 + 9.60817 * log_temp_k
+                - 0.01781 * salinity + 0.0001122 * salinity**2)
+    elif opt_k_carbonic == 10:
+        pk_1 = (3633.86 / temp_k - 61.2172 + 9.6777 * log_temp_k
+                - 0.011555 * salinity + 0.0001152 * salinity**2)
+        pk_2 = (471.78 / temp_k + 25.929 - 3.16967 * log_temp_k
+                - 0.01781 * salinity + 0.0001122 * salinity**2)
+    else:
+        raise ValueError('opt_k_carbonic must be 10 or 16')
+    k_1 = 10.0**-pk_1 / sws_to_total_p0 * _pcx(
+        -25.5 + 0.1271 * temperature,
+        (-3.08 + 0.0877 * temperature) / 1000,
+        pressure_bar, temp_k) * sws_to_total
+    k_2 = 10.0**-pk_2 / sws_to_total_p0 * _pcx(
+        -15.82 - 0.0219 * temperature,
+        (1.13 - 0.1475 * temperature) / 1000,
+        pressure_bar, temp_k) * sws_to_total
+    return {
+        'k_1': k_1,
+        'k_2': k_2,
+        'k_b': k_b,
+        'k_w': k_w,
+        'k_so4': k_so4,
+        'k_f': k_f,
+        'total_to_free': total_to_free,
+        'total_borate': total_borate,
+        'total_sulfate': total_sulfate,
+        'total_fluoride': total_fluoride,
+    }
+
+
+def _alkalinity_non_carbonate(h, k):
+    """Non-carbonate alkalinity and its derivative with respect to [H+]."""
+    h_free = h * k['total_to_free']
+    borate = k['total_borate'] * k['k_b'] / (k['k_b'] + h)
+    hso4 = k['total_sulfate'] * h_free / (h_free + k['k_so4'])
+    hf = k['total_fluoride'] * h_free / (h_free + k['k_f'])
+    alk = borate + k['k_w'] / h - h_free - hso4 - hf
+    dalk_dh = (
+        - k['total_borate'] * k['k_b'] / (k['k_b'] + h)**2
+        - k['k_w'] / h**2
+        - k['total_to_free']
+        - k['total_sulfate'] * k['k_so4'] * k['total_to_free'] / (h_free + k['k_so4'])**2
+        - k['total_fluoride'] * k['k_f'] * k['total_to_free'] / (h_free + k['k_f'])**2
+    )
+    return alk, dalk_dh
+
+
+def dic_from_ta_pH(ta, pH, k):
+    """DIC (mol/kg-sw) from TA (mol/kg-sw) and pH (total scale)."""
+    h = 10.0**-pH
+    alk_nc = _alkalinity_non_carbonate(h, k)[0]
+    return (ta - alk_nc) * (h**2 + k['k_1'] * h + k['k_1'] * k['k_2']) / (
+        k['k_1'] * (h + 2 * k['k_2']))
+
+
+def ta_from_dic_pH(dic, pH, k):
+    """TA (mol/kg-sw) from DIC (mol/kg-sw) and pH (total scale)."""
+    h = 10.0**-pH
+    alk_nc = _alkalinity_non_carbonate(h, k)[0]
+    return dic * k['k_1'] * (h + 2 * k['k_2']) / (
+        h**2 + k['k_1'] * h + k['k_1'] * k['k_2']) + alk_nc
+
+
+def pH_from_ta_dic(ta, dic, k, pH_guess=8.0):
+    """pH (total scale) from TA and DIC (mol/kg-sw) by Newton-Raphson on [H+].
+
+    Rows that have not converged after MAX_ITERATIONS steps, or that hit
+    NaN inputs or constants, are returned as NaN.
+    """
+    pH = np.broadcast_to(np.asarray(pH_guess, dtype=float), np.broadcast(ta, dic).shape).copy()
+    for _ in range(MAX_ITERATIONS):
+        h = 10.0**-pH
+        denom = h**2 + k['k_1'] * h + k['k_1'] * k['k_2']
+        alk_c = dic * k['k_1'] * (h + 2 * k['k_2']) / denom
+        dalk_c = dic * k['k_1'] * (denom - (h + 2 * k['k_2']) * (2 * h + k['k_1'])) / denom**2
+        alk_nc, dalk_nc = _alkalinity_non_carbonate(h, k)
+        # Newton step in pH: dTA/dpH = -ln(10) * h * dTA/dh
+        delta = (alk_c + alk_nc - ta) / (np.log(10) * h * (dalk_c + dalk_nc))
+        delta = np.clip(delta, -1, 1)
+        pH = pH + delta
+        # NaN steps compare False, so NaN rows do not hold up the others
+        if not np.any(np.abs(delta) >= PH_TOLERANCE):
+            break
+    return np.where(np.abs(delta) >= PH_TOLERANCE, np.nan, pH)
+
+
+def pH_total_out(ta, pH, salinity, temperature, temperature_out, pressure=0, pressure_out=3,
+                 lookup=False, chunk_size=16384):
+    """Convert total-scale pH from (temperature, pressure) to
+    (temperature_out, pressure_out) at constant TA (umol/kg-sw), with
+    fixed pressures (dbar).
+
+    Specialised, PyCO2SYS-free equivalent of
+    pyco2.sys(ta, pH, 1, 3, opt_pH_scale=1, opt_k_carbonic=16,
+    opt_total_borate=1, ...)['pH_total_out'], agreeing within 1e-6 pH.
+    Rows are solved in chunks of chunk_size, small enough to stay in cache.
+
+    With lookup=True, the constants are interpolated from constants_table
+    grids spanning the data (built once per cruise range and pressure)
+    instead of evaluated per row. A ValueError is raised if any constant
+    of a table is off by more than LOOKUP_RTOL, which bounds the added pH
+    error at about LOOKUP_RTOL / ln(10).
+    """
+    ta, pH, salinity, temperature, temperature_out = np.broadcast_arrays(
+        *[np.asarray(value, dtype=float) for value in (ta, pH, salinity, temperature, temperature_out)])
+    shape = ta.shape
+    ta, pH, salinity, temperature, temperature_out = [
+        value.ravel() for value in (ta * 1e-6, pH, salinity, temperature, temperature_out)]
+    if lookup:
+        # one table per pressure over the temperature range of both conditions
+        salinity_range = [np.nanmin(salinity), np.nanmax(salinity)]
+        temperature_range = [np.nanmin(temperature), np.nanmax(temperature),
+                             np.nanmin(temperature_out), np.nanmax(temperature_out)]
+        table_in, table_out = [constants_table(salinity_range, temperature_range, value)
+                               for value in (pressure, pressure_out)]
+        for table in (table_in, table_out):
+            error = max(table['max_relative_error'].values())
+            if error > LOOKUP_RTOL:
+                raise ValueError('constants interpolated with relative error {:.1e} > '
+                                 'LOOKUP_RTOL, use smaller steps'.format(error))
+    pH_out = np.empty(ta.size)
+    for start in range(0, ta.size, chunk_size):
+        rows = slice(start, start + chunk_size)
+        if lookup:
+            k_in = interpolate_constants(table_in, salinity[rows], temperature[rows])
+            k_out = interpolate_constants(table_out, salinity[rows], temperature_out[rows])
+        else:
+            k_in = constants(salinity[rows], temperature[rows], pressure)
+            k_out = constants(salinity[rows], temperature_out[rows], pressure_out)
+        dic = dic_from_ta_pH(ta[rows], pH[rows], k_in)
+        pH_out[rows] = pH_from_ta_dic(ta[rows], dic, k_out, pH_guess=pH[rows])
+    return pH_out.reshape(shape)
+
+
+def constants_table(salinity, temperature, pressure, opt_k_carbonic=16,
+                    salinity_step=0.01, temperature_step=0.01):
+    """Tabulate the SOLVER_CONSTANTS at one pressure (dbar) on a regular
+    grid spanning the finite values of salinity and temperature (degC).
+
+    The table holds the bilinear coefficients of every grid cell and the
+    largest relative interpolation error of each constant, found by
+    comparing with exact constants at the cell centres, where linear
+    interpolation error peaks. Tables are kept for the session, keyed on
+    the grid bounds, steps and options, so each is built once per cruise.
+    """
+    def grid(values, step):
+        # one extra point each side, so that rounding cannot put data
+        # at the edges outside the table
+        values = np.asarray(values, dtype=float)
+        return int(np.floor(np.nanmin(values) / step)) - 1, int(np.ceil(np.nanmax(values) / step)) + 1
+
+    salinity_bounds = grid(salinity, salinity_step)
+    temperature_bounds = grid(temperature, temperature_step)
+    key = (salinity_bounds, temperature_bounds, float(pressure), opt_k_carbonic,
+           salinity_step, temperature_step)
+    if key in _TABLES:
+        return _TABLES[key]
+    salinity_grid = salinity_step * np.arange(salinity_bounds[0], salinity_bounds[1] + 1)
+    temperature_grid = temperature_step * np.arange(temperature_bounds[0], temperature_bounds[1] + 1)
+    sal, temp = np.meshgrid(salinity_grid, temperature_grid, indexing='ij')
+    values = constants(sal, temp, pressure, opt_k_carbonic=opt_k_carbonic)
+    values = np.stack([values[name] for name in SOLVER_CONSTANTS], axis=-1)
+    # value = c + fx * c_x + fy * (c_y + fx * c_xy) within every cell,
+    # one row of coefficients per cell so a lookup is a single gather
+    c = values[:-1, :-1]
+    c_x = values[1:, :-1] - c
+    c_y = values[:-1, 1:] - c
+    c_xy = values[1:, 1:] - values[1:, :-1] - c_y
+    table = {
+        'salinity': salinity_grid,
+        'temperature': temperature_grid,
+        'coefficients': np.stack([c, c_x, c_y, c_xy], axis=-2).reshape(-1, 4, len(SOLVER_CONSTANTS)),
+    }
+    sal_mid, temp_mid = np.meshgrid(salinity_grid[:-1] + salinity_step / 2,
+                                    temperature_grid[:-1] + temperature_step / 2,
+                                    indexing='ij')
+    exact = constants(sal_mid, temp_mid, pressure, opt_k_carbonic=opt_k_carbonic)
+    interpolated = interpolate_constants(table, sal_mid, temp_mid)
+    table['max_relative_error'] = {
+        name: np.max(np.abs(interpolated[name] / exact[name] - 1)) for name in SOLVER_CONSTANTS}
+    _TABLES[key] = table
+    return table
+
+
+def interpolate_constants(table, salinity, temperature, chunk_size=16384):
+    """Bilinear interpolation of a constants_table at salinity and
+    temperature (degC), NaN outside the table, plus the totals from
+    salinity: the constants the pH solvers use. Rows are evaluated in
+    chunks of chunk_size, small enough to stay in cache."""
+    salinity, temperature = np.broadcast_arrays(np.asarray(salinity, dtype=float),
+                                                np.asarray(temperature, dtype=float))
+    shape = salinity.shape
+    salinity_grid, temperature_grid = table['salinity'], table['temperature']
+    x = (salinity.ravel() - salinity_grid[0]) / (salinity_grid[1] - salinity_grid[0])
+    y = (temperature.ravel() - temperature_grid[0]) / (temperature_grid[1] - temperature_grid[0])
+    inside = (x >= 0) & (x <= salinity_grid.size - 1) & (y >= 0) & (y <= temperature_grid.size - 1)
+    x = np.where(inside, x, 0)
+    y = np.where(inside, y, 0)
+    i = np.minimum(x.astype(int), salinity_grid.size - 2)
+    j = np.minimum(y.astype(int), temperature_grid.size - 2)
+    fx = (x - i)[:, np.newaxis]
+    fy = (y - j)[:, np.newaxis]
+    cell = i * (temperature_grid.size - 1) + j
+    # one contiguous row per constant, as the solvers use them
+    values = np.empty((len(SOLVER_CONSTANTS), x.size))
+    for start in range(0, x.size, chunk_size):
+        rows = slice(start, start + chunk_size)
+        c, c_x, c_y, c_xy = np.moveaxis(table['coefficients'][cell[rows]], 1, 0)
+        values[:, rows] = (c + fx[rows] * c_x + fy[rows] * (c_y + fx[rows] * c_xy)).T
+    values[:, ~inside] = np.nan
+    results = {name: value.reshape(shape) for name, value in zip(SOLVER_CONSTANTS, values)}
+    results['total_borate'], results['total_sulfate'], results['total_fluoride'] = totals(salinity)
+    return results
+
+
+def _tile(values, copies):
+    """Repeat per-sample arrays for copies stacked perturbations."""
+    if copies == 1:
+        return values
+    if isinstance(values, dict):
+        return {key: np.tile(value, copies) for key, value in values.items()}
+    return np.tile(values, copies)
+
+
+def pH_ta_dic_solver(ta, dic, salinity, temperature, pressure=0, opt_k_carbonic=10):
+    """Return solve(ta, dic) giving total-scale pH from perturbed TA and DIC
+    (umol/kg-sw), plus the unperturbed pH.
+
+    Constants and totals are computed once per sample, and each solve is
+    warm-started from the unperturbed pH, so a perturbation costs only the
+    speciation iteration. solve accepts any whole number of copies of the
+    samples stacked end to end, as built by monte_carlo_uncertainty.
+    Matches pyco2.sys(ta, dic, 1, 2, opt_pH_scale=1, ...)['pH_total'] for
+    nutrient-free samples.
+    """
+    salinity = np.asarray(salinity, dtype=float)
+    k = constants(salinity, np.asarray(temperature, dtype=float), pressure,
+                  opt_k_carbonic=opt_k_carbonic)
+    pH_0 = pH_from_ta_dic(np.asarray(ta, dtype=float) * 1e-6,
+                          np.asarray(dic, dtype=float) * 1e-6, k)
+    n = np.size(pH_0)
+
+    def solve(ta, dic):
+        copies = np.size(ta) // n
+        return pH_from_ta_dic(np.asarray(ta, dtype=float) * 1e-6,
+                              np.asarray(dic, dtype=float) * 1e-6,
+                              _tile(k, copies), pH_guess=_tile(pH_0, copies))
+    return solve, pH_0
+
+
+def pH_free_dic_solver(pH_free, dic, salinity, temperature, temperature_out,
+                       pressure=0, pressure_out=0, opt_k_carbonic=10):
+    """Return solve(dic) giving total-scale pH at (temperature_out,
+    pressure_out) from a fixed free-scale pH at (temperature, pressure)
+    and perturbed DIC (umol/kg-sw), plus the unperturbed result.
+
+    At fixed input pH, TA is linear in DIC, so its coefficients and the
+    output constants are computed once per sample; each solve is
+    warm-started from the unperturbed output pH. Matches pyco2.sys(pH_free,
+    dic, 3, 2, opt_pH_scale=3, ...)['pH_total_out'] for nutrient-free
+    samples.
+    """
+    salinity = np.asarray(salinity, dtype=float)
+    k_in = constants(salinity, np.asarray(temperature, dtype=float), pressure,
+                     opt_k_carbonic=opt_k_carbonic)
+    pH_total = np.asarray(pH_free, dtype=float) + np.log10(k_in['total_to_free'])
+    # TA = alk_nc + dic * alk_per_dic at the fixed input pH
+    alk_nc = ta_from_dic_pH(0, pH_total, k_in)
+    alk_per_dic = ta_from_dic_pH(1, pH_total, k_in) - alk_nc
+    del k_in
+    k_out = constants(salinity, np.asarray(temperature_out, dtype=float), pressure_out,
+                      opt_k_carbonic=opt_k_carbonic)
+    dic = np.asarray(dic, dtype=float) * 1e-6
+    pH_0 = pH_from_ta_dic(alk_nc + dic * alk_per_dic, dic, k_out, pH_guess=pH_total)
+    n = np.size(pH_0)
+
+    def solve(dic):
+        copies = np.size(dic) // n
+        dic = np.asarray(dic, dtype=float) * 1e-6
+        return pH_from_ta_dic(_tile(alk_nc, copies) + dic * _tile(alk_per_dic, copies), dic,
+                              _tile(k_out, copies), pH_guess=_tile(pH_0, copies))
+    return solve, pH_0
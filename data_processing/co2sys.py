@@ -0,0 +1,75 @@
+import numpy as np
+import PyCO2SYS as pyco2
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from data_processing.cache import cache_key, cache_load, cache_save
+
+def _sys_chunk(outputs, args, kwargs):
+    """Run pyco2.sys on one chunk and keep only the requested outputs."""
+    results = pyco2.sys(*args, **kwargs)
+    return {key: np.asarray(results[key]) for key in outputs}
+
+def co2sys(par1, par2, par1_type, par2_type, outputs, chunk_size=100000,
+           pool=None, max_workers=None, cache_dir=None, cache_max_bytes=500e6,
+           **kwargs):
+    """Evaluate pyco2.sys in row chunks and return a dict holding only the
+    requested output arrays.
+
+    Peak memory scales with chunk_size times the ~100 PyCO2SYS outputs
+    instead of the full column length. Set pool to 'thread' or 'process'
+    to evaluate chunks concurrently.
+
+    With cache_dir set, results are memoised on disk keyed on a hash of the
+    inputs, options, requested outputs and PyCO2SYS version, so unchanged
+    inputs skip the solve entirely. The least recently used results are
+    evicted once the cache exceeds cache_max_bytes.
+    """
+    if isinstance(outputs, str):
+        outputs = [outputs]
+    args = [np.asarray(arg) for arg in (par1, par2, par1_type, par2_type)]
+    kwargs = {key: np.asarray(value) for key, value in kwargs.items()}
+
+    # Number of rows is the longest array argument, scalars (e.g. the
+    # parameter types and options) are broadcast
+    sizes = [np.size(value) for value in args + list(kwargs.values()) if np.ndim(value) > 0]
+    n = max(sizes) if sizes else 1
+    if n == 0:
+        return {key: np.empty(0) for key in outputs}
+
+    if cache_dir is not None:
+        digest = cache_key(*args, outputs=outputs, version=pyco2.__version__, **kwargs)
+        results = cache_load(cache_dir, digest)
+        if results is not None and all(output in results for output in outputs):
+            return results
+
+    def chunk(value, start, stop):
+        if np.ndim(value) > 0 and np.size(value) == n:
+            return value[start:stop]
+        return value
+
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    tasks = [(outputs,
+              [chunk(arg, start, stop) for arg in args],
+              {key: chunk(value, start, stop) for key, value in kwargs.items()})
+             for start, stop in bounds]
+
+    if pool is None:
+        chunk_results = (_sys_chunk(*task) for task in tasks)
+    else:
+        executor = {'thread': ThreadPoolExecutor,
+                    'process': ProcessPoolExecutor}[pool](max_workers=max_workers)
+        chunk_results = executor.map(_sys_chunk, *zip(*tasks))
+
+    # Fill preallocated output arrays chunk by chunk
+    results = {}
+    try:
+        for (start, stop), result in zip(bounds, chunk_results):
+            for name in outputs:
+                if name not in results:
+                    results[name] = np.empty(n, dtype=result[name].dtype)
+                results[name][start:stop] = result[name]
+    finally:
+        if pool is not None:
+            executor.shutdown()
+    if cache_dir is not None:
+        cache_save(cache_dir, digest, results, max_bytes=cache_max_bytes)
+    return results
@@ -0,0 +1,227 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Decimals written for the UWS time-series columns, about one digit beyond
+# the precision of each sensor; columns not listed are written in full
+UWS_PRECISION = {
+    'pH_cell': 4,
+    'pH': 4,
+    'pH_insitu_ta_est': 4,
+    'pchip_pH_difference': 4,
+    'pH_optode_corrected': 4,
+    'pH_optode_corrected_RMSE': 4,
+    'SMA': 4,
+    'temp_cell': 3,
+    'SBE38_water_temp': 3,
+    'SBE45_water_temp': 3,
+    'temp_diff': 3,
+    'salinity': 3,
+    'pchip_salinity': 3,
+    'SBE45_sal': 3,
+    'ta_est': 2,
+    'lat': 5,
+    'lon': 5,
+}
+
+def _arrow_column(series):
+    """series as a pyarrow array that pyarrow.csv writes as pandas.to_csv
+    does: floats and booleans as the text pandas writes (numpy's str),
+    other objects as their str, integers as they are and datetimes at the
+    coarsest unit that keeps them exact."""
+    import pyarrow as pa
+    kind = series.dtype.kind
+    if kind in 'iu':
+        return pa.array(series, from_pandas=True)
+    if kind == 'M' and series.dt.tz is None:
+        nanoseconds = series.dropna().to_numpy(dtype='datetime64[ns]').view('int64')
+        for unit, size in [('D', 86400 * 10**9), ('s', 10**9), ('ms', 10**6), ('us', 10**3)]:
+            if np.all(nanoseconds % size == 0):
+                array = pa.array(series, from_pandas=True)
+                return array.cast(pa.date32() if unit == 'D' else pa.timestamp(unit))
+        return pa.array(series, from_pandas=True)
+    if kind == 'f':
+        return _float_text(series.to_numpy(na_value=np.nan))
+    if kind == 'b':
+        values = series.to_numpy(dtype=bool, na_value=False)
+        return pa.array(np.where(values, 'True', 'False'), mask=series.isnull().to_numpy())
+    series = series.astype(object)
+    return pa.array(series.where(series.isnull(), series.astype(str)), type=pa.string(),
+                    from_pandas=True)
+
+# Magnitudes below which pyarrow writes floats as numpy's str does (down
+# to 1e-3, with margin), apart from the '.0' of whole numbers; checked for
+# float32 and float64
+_ARROW_FLOAT_LIMIT = {np.dtype('float32'): 1e6, np.dtype('float64'): 1e9}
+
+def _float_text(values):
+    """Float array as a pyarrow string array of numpy's str of every value
+    (the text pandas writes), nulls for NaN. Values that pyarrow formats
+    differently (tiny, large or whole) are fixed up; only the first two
+    need numpy's slower formatting."""
+    import pyarrow as pa, pyarrow.compute as pc
+    limit = _ARROW_FLOAT_LIMIT.get(values.dtype, 0)
+    size = np.abs(values)
+    whole = (values == np.floor(values)) & (size < limit) & ~((values == 0) & np.signbit(values))
+    plain = (values != np.floor(values)) & (size >= 1e-3) & (size < limit)
+    other = ~(whole | plain | np.isnan(values))
+    array = pa.array(values, from_pandas=True)
+    text = pc.cast(array, pa.string())
+    if whole.any():
+        integers = pc.cast(pa.array(np.where(whole, values, 0).astype('int64')), pa.string())
+        text = pc.if_else(pa.array(whole), pc.binary_join_element_wise(integers, '.0', ''), text)
+    if other.any():
+        text = pc.replace_with_mask(text, pa.array(other), pa.array(values[other].astype(str)))
+    return text
+
+def _needs_quotes(array):
+    """Whether a string array has fields that the csv module would quote."""
+    import pyarrow as pa, pyarrow.compute as pc
+    if not pa.types.is_string(array.type):
+        return False
+    return pc.any(pc.match_substring_regex(array, '[,"\r\n]')).as_py() or False
+
+def write_csv(df, fname, precision=None, index=False, mode='w', header=True,
+              batch_size=50000):
+    """Write df to the csv file fname, rounding the columns in precision
+    (dict of column: decimals) so that floats are written with only the
+    digits that matter.
+
+    The text is the same as df.to_csv. The header is written by pandas;
+    the rows are converted to text column by column (floats as numpy's str,
+    as pandas does) and joined into lines by pyarrow.csv in native code,
+    in batches of batch_size rows. Frames with fields that need quoting, a
+    single column or a MultiIndex are written by pandas.
+    """
+    import pyarrow as pa, pyarrow.csv as pa_csv
+    if precision:
+        df = df.round(precision)
+    columns = [df.index.to_series()] if index else []
+    columns += [df.iloc[:, i] for i in range(df.shape[1])]
+    arrays = None
+    if len(columns) > 1 and not (index and isinstance(df.index, pd.MultiIndex)):
+        arrays = [_arrow_column(column) for column in columns]
+    if arrays is None or any(_needs_quotes(array) for array in arrays):
+        # fields the csv module quotes (also the lone empty field of a
+        # one-column row) are left to pandas
+        df.to_csv(fname, index=index, mode=mode, header=header)
+        return
+    table = pa.Table.from_arrays(arrays, names=[str(i) for i in range(len(arrays))])
+    with open(fname, mode + 'b') as f:
+        if header:
+            f.write(df.iloc[:0].to_csv(None, index=index, lineterminator=os.linesep).encode())
+        pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False,
+                                                       batch_size=batch_size,
+                                                       eol=os.linesep,
+                                                       quoting_style='none'))
+
+# A schema maps every output column, in order, to either
+#   - the name of a source column ('Latitude': 'lat'),
+#   - a constant ('pH_flag': {'value': 2}),
+#   - a part of the source date_time column ('Year_UTC': {'date_part': 'year'}).
+# Optional keys: 'date_time' (source datetime column), 'dropna' (source
+# columns without which a row is dropped), 'fill_value' (for missing values),
+# 'sort_by' (output columns), 'precision' (decimals of output columns in
+# the csv) and 'attrs' (NetCDF global attributes).
+
+def schema_usecols(schema, keys=()):
+    """Callable for the usecols argument of pd.read_csv, keeping only the
+    source columns the schema needs, plus keys (e.g. for joins)."""
+    needed = set(keys) | set(schema.get('dropna', []))
+    needed |= {source for source in schema['columns'].values() if isinstance(source, str)}
+    if 'date_time' in schema:
+        needed.add(schema['date_time'])
+    return lambda column: column in needed
+
+def format_frame(df, schema, typed=False):
+    """Build the output columns of the schema from df, in schema order.
+
+    Source columns absent from df give missing values, which are then
+    replaced by the schema's fill_value if it has one. With typed, for
+    binary formats, missing values are kept and the date-part columns are
+    replaced by a single datetime64 'time' column.
+    """
+    if schema.get('dropna'):
+        df = df.dropna(subset=schema['dropna'])
+    if 'date_time' in schema:
+        date_time = pd.to_datetime(df[schema['date_time']])
+    out = pd.DataFrame(index=df.index)
+    for column, source in schema['columns'].items():
+        if isinstance(source, str):
+            out[column] = df[source] if source in df else float('nan')
+        elif 'value' in source:
+            out[column] = source['value']
+        elif typed:
+            if 'time' not in out:
+                out['time'] = date_time
+        else:
+            out[column] = getattr(date_time.dt, source['date_part'])
+    if 'fill_value' in schema and not typed:
+        out = out.fillna(schema['fill_value'])
+    if schema.get('sort_by'):
+        out = out.sort_values(by=schema['sort_by'])
+    return out
+
+def _write_netcdf(df, fname, schema):
+    """Write a typed frame as a CF NetCDF file, one observation per row."""
+    import xarray as xr
+    ds = xr.Dataset.from_dataframe(df.reset_index(drop=True).rename_axis('obs'))
+    ds = ds.drop_vars('obs')
+    encoding = {}
+    for name, variable in ds.data_vars.items():
+        if variable.dtype.kind == 'f' and 'fill_value' in schema:
+            encoding[name] = {'_FillValue': float(schema['fill_value'])}
+        elif variable.dtype.kind in 'fM':
+            encoding[name] = {'_FillValue': None}
+    if 'time' in ds:
+        ds = ds.set_coords('time')
+        ds['time'].attrs.update(standard_name='time', axis='T')
+        encoding['time'] = {'units': 'seconds since 1970-01-01 00:00:00',
+                            'calendar': 'standard', '_FillValue': None}
+    ds.attrs.update(Conventions='CF-1.8', featureType='point')
+    ds.attrs.update(schema.get('attrs', {}))
+    ds.to_netcdf(fname, encoding=encoding)
+
+def write_formatted(data, fnames, schema):
+    """Format data (a DataFrame or an iterable of DataFrame chunks, e.g.
+    from pd.read_csv with chunksize) with the schema and write it to every
+    file in fnames in a single pass.
+
+    The format follows the extension: '.csv' (with fill values and split
+    date columns, appended chunk by chunk), '.parquet' (typed, streamed
+    by row group; needs pyarrow) or '.nc' (CF NetCDF with a time
+    coordinate and _FillValue, written once all chunks are formatted;
+    needs xarray).
+    """
+    if isinstance(fnames, str):
+        fnames = [fnames]
+    extensions = [os.path.splitext(fname)[1].lower() for fname in fnames]
+    for extension in extensions:
+        if extension not in ('.csv', '.parquet', '.nc'):
+            raise ValueError('cannot write {} files'.format(extension))
+    if isinstance(data, pd.DataFrame):
+        data = [data]
+    parquet_writers, netcdf_chunks = {}, []
+    for i, chunk in enumerate(data):
+        text = format_frame(chunk, schema) if '.csv' in extensions else None
+        typed = format_frame(chunk, schema, typed=True) if set(extensions) - {'.csv'} else None
+        for fname, extension in zip(fnames, extensions):
+            if extension == '.csv':
+                write_csv(text, fname, precision=schema.get('precision'),
+                          mode='w' if i == 0 else 'a', header=i == 0)
+            elif extension == '.parquet':
+                import pyarrow as pa, pyarrow.parquet as pq
+                if fname not in parquet_writers:
+                    table = pa.Table.from_pandas(typed, preserve_index=False)
+                    parquet_writers[fname] = pq.ParquetWriter(fname, table.schema)
+                else:
+                    table = pa.Table.from_pandas(typed, schema=parquet_writers[fname].schema,
+                                                 preserve_index=False)
+                parquet_writers[fname].write_table(table)
+        if '.nc' in extensions:
+            netcdf_chunks.append(typed)
+    for writer in parquet_writers.values():
+        writer.close()
+    for fname, extension in zip(fnames, extensions):
+        if extension == '.nc':
+            _write_netcdf(pd.concat(netcdf_chunks), fname, schema)
@@ -0,0 +1,87 @@
+import os
+import numpy as np, pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+def read_cnv_header(fname):
+    """Column names, units, bad-flag value and number of header lines of a
+    SBE .cnv file.
+
+    Files without a '*END*' line are treated as tab-separated tables whose
+    first line holds the column names (units and bad flag are then None).
+    """
+    names, units, bad_flag = [], [], None
+    with open(fname, encoding='unicode_escape') as f:
+        for n_header, line in enumerate(f, start=1):
+            if line.startswith('# name '):
+                # '# name 0 = prDM: Pressure, Digiquartz [db]'
+                short, _, long_name = line.split('=', 1)[1].partition(':')
+                names.append(short.strip())
+                units.append(long_name[long_name.rfind('[') + 1:long_name.rfind(']')]
+                             if '[' in long_name else '')
+            elif line.startswith('# bad_flag'):
+                bad_flag = float(line.split('=', 1)[1])
+            elif line.startswith('*END*'):
+                return {'names': names, 'units': units,
+                        'bad_flag': bad_flag, 'n_header': n_header}
+    with open(fname, encoding='unicode_escape') as f:
+        names = f.readline().rstrip('\r\n').split('\t')
+    return {'names': names, 'units': None, 'bad_flag': None, 'n_header': None}
+
+def read_cnv(fname, usecols=None):
+    """Read the channels of a .cnv file selected by usecols (list of names
+    or callable on a name; all if None) as float64, with bad-flag values
+    replaced by NaN."""
+    header = read_cnv_header(fname)
+    names = header['names']
+    if usecols is None:
+        keep = names
+    elif callable(usecols):
+        keep = [name for name in names if usecols(name)]
+    else:
+        keep = [name for name in names if name in usecols]
+    if header['n_header'] is None:
+        df = pd.read_csv(fname, sep='\t', usecols=keep, encoding='unicode_escape',
+                         dtype={name: np.float64 for name in keep})
+    else:
+        df = pd.read_csv(fname, sep=r'\s+', header=None, names=names,
+                         skiprows=header['n_header'], usecols=keep,
+                         dtype={name: np.float64 for name in keep})
+    if header['bad_flag'] is not None:
+        df = df.mask(df == header['bad_flag'])
+    return df[keep]
+
+def _read_station(fname, usecols, drop, bottle):
+    """Bottle-level means of one cast, without bottle 0 (no bottle fired)."""
+    def keep(name):
+        if name == bottle:
+            return True
+        if drop is not None and name in drop:
+            return False
+        return usecols is None or name in usecols
+    df = read_cnv(fname, usecols=keep)
+    df = df.groupby(bottle, sort=True).mean().reset_index()
+    df = df[df[bottle] != 0].astype({bottle: int})
+    df.insert(0, 'station', os.path.splitext(os.path.basename(fname))[0])
+    return df
+
+def read_ctd(directory, usecols=None, drop=None, bottle='niskin', pool='thread', max_workers=None):
+    """Read every .cnv cast in directory and reduce each to bottle-level
+    means, one row per station and bottle.
+
+    Only the channels in usecols (all if None), minus those in drop, are
+    parsed. Stations are named after the files and discovered
+    automatically; casts are parsed concurrently in a 'thread' or
+    'process' pool (or serially if pool is None).
+    """
+    fnames = sorted(os.path.join(directory, file) for file in os.listdir(directory)
+                    if file.lower().endswith('.cnv'))
+    args = [(fname, usecols, drop, bottle) for fname in fnames]
+    if pool is None:
+        stations = [_read_station(*arg) for arg in args]
+    else:
+        executor = {'thread': ThreadPoolExecutor,
+                    'process': ProcessPoolExecutor}[pool](max_workers=max_workers)
+        with executor:
+            stations = list(executor.map(_read_station, *zip(*args)))
+    ctd_data = pd.concat(stations).reset_index(drop=True)
+    return ctd_data.sort_values(by=['station', bottle])
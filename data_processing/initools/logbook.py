@@ -1,8 +1,13 @@
 import pandas as pd
+from data_processing.stabilisation import transient_mask
+from data_processing.memory import compact_dtypes
 # from data_processing import read_pyrosci
 
-def logbook(data_dict, file_list):
-    """Apply logbook notes from cruise SO279 to Pyroscience DataFrame."""
+def logbook(data_dict, file_list, auto_stabilisation=False, compact=False):
+    """Apply logbook notes from cruise SO279 to Pyroscience DataFrame.
+
+    With compact, times are kept as datetime64 (to the second) and the
+    columns get compact dtypes (see compact_dtypes)."""
     # data_dict, file_list = read_pyrosci(datasheet_filepath, txt_filepath)
     # FILES CLEAN UP
     # only keep relevant data (apply cruise notes)
@@ -57,8 +62,11 @@ def logbook(data_dict, file_list):
     data_dict['2020-12-28_151321_NAPTRAM20207'] = data_dict['2020-12-28_151321_NAPTRAM20207'][L]
     
     # for all files, ignore first 20 min for optode stabilization
+    # (and the detected start-up transient with auto_stabilisation)
     for file in file_list:
         L = (data_dict[file].sec > 1200)
+        if auto_stabilisation:
+            L &= ~transient_mask(data_dict[file], by=None)
         data_dict[file] = data_dict[file][L]
         data_dict[file]['date_time'] = pd.to_datetime(data_dict[file].date_time,
                           format='%d-%m-%Y %H:%M:%S.%f')
@@ -67,6 +75,10 @@ def logbook(data_dict, file_list):
     data = pd.concat(data_dict.values(), ignore_index=True)
     
     # drop ms
-    data['date_time'] = data['date_time'].apply(lambda x: x.strftime('%d-%m-%Y %H:%M:%S'))
+    if compact:
+        data['date_time'] = data['date_time'].dt.floor('s')
+        data = compact_dtypes(data)
+    else:
+        data['date_time'] = data['date_time'].apply(lambda x: x.strftime('%d-%m-%Y %H:%M:%S'))
     
     return data
\ No newline at end of file
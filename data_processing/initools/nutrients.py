@@ -0,0 +1,72 @@
+import os
+import hashlib
+import pandas as pd, numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Instrument QC rows (CRMs, cocktails, wash water) and the units row,
+# removed from every nutrient run
+QC_SAMPLES = [
+    'CRM BU-0899 OCT20',
+    'CRM BU-1271',
+    'CRM BU-1310 NEW',
+    'CRM CH-2333',
+    'COCKT1008X250',
+    'COCKTAIL1008X250',
+    'COCKTAIL1008X500',
+    'WASHWATER',
+    'WASH WATER',
+    'WASWATER',
+    'UNIT',
+]
+
+def _parse_workbook(fname):
+    """Read a nutrient analyser run, using the 'METH' row as header."""
+    raw = pd.read_excel(fname, header=None, dtype=object)
+    header_row = np.flatnonzero(raw[0].astype(str).str.strip() == 'METH')[0]
+    columns = ['Unnamed: {}'.format(i) if pd.isnull(name) else str(name)
+               for i, name in enumerate(raw.iloc[header_row])]
+    df = raw.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = columns
+    df['METH'] = df['METH'].astype(str)
+    for column in columns[1:]:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+def _read_workbook(fname, cache_dir):
+    """Parse a workbook, or load its columnar copy cached under the hash
+    of the workbook's bytes."""
+    if cache_dir is None:
+        return _parse_workbook(fname)
+    with open(fname, 'rb') as f:
+        key = hashlib.sha1(f.read()).hexdigest()
+    cache_fname = os.path.join(cache_dir, key + '.parquet')
+    if os.path.exists(cache_fname):
+        return pd.read_parquet(cache_fname)
+    df = _parse_workbook(fname)
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(cache_fname, index=False)
+    return df
+
+def read_nutrients(fnames, cache_dir='./data/processing/nutrients_cache',
+                   remove_qc=True, pool='process', max_workers=None):
+    """Read nutrient analyser workbooks into one DataFrame.
+
+    The header row ('METH', then one column per channel) is found in each
+    sheet and the units row and, with remove_qc, the QC_SAMPLES rows are
+    dropped. Workbooks are parsed concurrently in a 'process' or 'thread'
+    pool (or serially if pool is None) and each is cached as a Parquet file keyed on its hash, so unchanged workbooks
+    are only parsed once (cache_dir None disables the cache).
+    """
+    if pool is None:
+        runs = [_read_workbook(fname, cache_dir) for fname in fnames]
+    else:
+        executor = {'thread': ThreadPoolExecutor,
+                    'process': ProcessPoolExecutor}[pool](max_workers=max_workers)
+        with executor:
+            runs = list(executor.map(_read_workbook, fnames, [cache_dir] * len(fnames)))
+    nuts = pd.concat(runs).reset_index(drop=True)
+    if remove_qc:
+        nuts = nuts[~nuts['METH'].isin(QC_SAMPLES)]
+    else:
+        nuts = nuts[nuts['METH'] != 'UNIT']
+    return nuts.reset_index(drop=True)
@@ -1,34 +1,52 @@
 import pandas as pd, numpy as np
+import os
 import re
 import datetime
+from data_processing.memory import compact_dtypes
+from data_processing.initools.smb_store import read_smb_store
 
-def smb(data, smb_filepath):
-    """Add relevant metadata (SMB) to PyroScience DataFrame."""
+def smb(data, smb_filepath, compact=False):
+    """Add relevant metadata (SMB) to PyroScience DataFrame.
+
+    smb_filepath is the SMB log or a store made from it with convert_smb,
+    from which only the parts covering the optode deployments are read.
+
+    With compact (data from logbook with compact), the SMB times are parsed
+    to datetime64 for an integer-keyed merge and the SMB columns get
+    compact dtypes before the merge."""
     # data = logbook(datasheet_filepath, txt_filepath)
-    chunky = pd.read_csv('./data/SMB/smb_all_hr.dat',
-                     chunksize=150000,
-                     na_values=9999,
-                     delimiter='\t',
-                     encoding= 'unicode_escape',
-                     low_memory=False)
+    if os.path.isdir(smb_filepath):
+        # time-partitioned store (see convert_smb): only read the parts
+        # overlapping the optode deployments
+        times = pd.to_datetime(data['date_time'], format='%d-%m-%Y %H:%M:%S')
+        windows = times.groupby(data['filename'], observed=True).agg(['min', 'max'])
+        smb = read_smb_store(smb_filepath, windows=list(windows.itertuples(index=False)))
+        smb.rename({'SMB.RSSMB.T_SBE38':'SBE38_water_temp'}, axis=1, inplace=True)
+    else:
+        chunky = pd.read_csv(smb_filepath,
+                             chunksize=150000,
+                             na_values=9999,
+                             delimiter='\t',
+                             encoding= 'unicode_escape',
+                             low_memory=False)
 
-    # create empty list to hold cleaned up chunks
-    smb_list = []
+        # create empty list to hold cleaned up chunks
+        smb_list = []
     
-    # rename temp_source column to python friendly, then only keep where 
-    # temp_source has data, then store cleaned up chunks into smb_list
-    for file in chunky:
-        file = file.drop([file.index[0], file.index[1]])
-        file.reset_index(drop=True)
-        rn = {
-           'SMB.RSSMB.T_SBE38':'SBE38_water_temp'
-           }
-        file.rename(rn, axis=1, inplace=True)
-        # file.dropna(subset=['SBE38_water_temp'], inplace=True)
-        smb_list.append(file)
+        # rename temp_source column to python friendly, then only keep where 
+        # temp_source has data, then store cleaned up chunks into smb_list
+        for file in chunky:
+            file = file.drop([file.index[0], file.index[1]])
+            file.reset_index(drop=True)
+            rn = {
+               'SMB.RSSMB.T_SBE38':'SBE38_water_temp'
+               }
+            file.rename(rn, axis=1, inplace=True)
+            # file.dropna(subset=['SBE38_water_temp'], inplace=True)
+            smb_list.append(file)
     
-    # create 1 df holding all cleaned up smb data
-    smb = pd.concat(smb_list)
+        # create 1 df holding all cleaned up smb data
+        smb = pd.concat(smb_list)
     
     # rename headers with python friendly names
     rn = {
@@ -82,9 +100,15 @@ def smb(data, smb_filepath):
     smb.rename(rn, axis=1, inplace=True)
     
     # convert SMB date format to match PyroSci date format
-    def date_convert(date_to_convert):
-         return datetime.datetime.strptime(date_to_convert, '%Y/%m/%d %H:%M:%S').strftime('%d-%m-%Y %H:%M:%S')
-    smb['date_time'] = smb['date_time'].apply(date_convert)
+    if compact:
+        smb['date_time'] = pd.to_datetime(smb['date_time'], format='%Y/%m/%d %H:%M:%S')
+        smb = compact_dtypes(smb)
+    elif pd.api.types.is_datetime64_any_dtype(smb['date_time']):
+        smb['date_time'] = smb['date_time'].dt.strftime('%d-%m-%Y %H:%M:%S')
+    else:
+        def date_convert(date_to_convert):
+             return datetime.datetime.strptime(date_to_convert, '%Y/%m/%d %H:%M:%S').strftime('%d-%m-%Y %H:%M:%S')
+        smb['date_time'] = smb['date_time'].apply(date_convert)
     
     # merge SMB w/ PyroSci data
     df = data.merge(right=smb, 
@@ -0,0 +1,132 @@
+import os
+import re
+import pandas as pd
+
+CATALOGUE = 'catalogue.csv'
+
+def _tidy_types(df):
+    """Numbers for the columns that parse as numbers, strings (and missing
+    values) for the others, so that every part has one type per column."""
+    for column in df.columns[df.dtypes == object]:
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (ValueError, TypeError):
+            df[column] = df[column].where(df[column].isnull(), df[column].astype(str))
+    return df
+
+def _source(smb_filepath):
+    """Size and modification time of the SMB log, as the catalogue records them."""
+    stat = os.stat(smb_filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+def _read_catalogue(store_dir):
+    """The store's catalogue, empty if there is none. Catalogues written
+    before the log's size and modification time were recorded get empty
+    source columns."""
+    fname = os.path.join(store_dir, CATALOGUE)
+    catalogue = (pd.read_csv(fname, parse_dates=['start', 'end']) if os.path.exists(fname)
+                 else pd.DataFrame(columns=['file', 'start', 'end', 'rows']))
+    return (catalogue.reindex(columns=['file', 'start', 'end', 'rows', 'source',
+                                       'source_size', 'source_mtime_ns'])
+            .astype({'source': object, 'source_size': 'Int64', 'source_mtime_ns': 'Int64'}))
+
+def _converted(catalogue, smb_filepath):
+    """Catalogue rows of the parts converted from the SMB log."""
+    source = os.path.basename(smb_filepath)
+    stem = os.path.splitext(source)[0]
+    # parts converted before the source was recorded: match the names
+    legacy = (catalogue['source'].isnull()
+              & catalogue['file'].str.fullmatch(re.escape(stem) + r'_\d{10}_\d{5}\.parquet'))
+    return catalogue[(catalogue['source'] == source) | legacy]
+
+def smb_store_current(smb_filepath, store_dir):
+    """Whether the store has the SMB log as it is now, i.e. its catalogue
+    records the size and modification time of the log's last conversion."""
+    converted = _converted(_read_catalogue(store_dir), smb_filepath)
+    if converted.empty:
+        return False
+    last = converted.iloc[-1]
+    if pd.isnull(last['source_mtime_ns']):
+        return False
+    return (last['source_size'], last['source_mtime_ns']) == _source(smb_filepath)
+
+def convert_smb(smb_filepath, store_dir, freq='D', chunksize=150000):
+    """Split the ship's SMB log into time partitions in a Parquet store.
+
+    The tab-separated log is read in chunks; its rows are grouped by
+    their 'date time' floored to freq ('D' daily, 'H' hourly) and every
+    group is written as its own part file in store_dir. Each part is
+    listed in the catalogue (catalogue.csv) with its first and last time
+    and the size and modification time of the log (see smb_store_current).
+    Converting a log again, e.g. after data were appended to it, only adds
+    parts for the rows after the last time already in the store from that
+    log. Returns the catalogue rows added.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    source = os.path.basename(smb_filepath)
+    stem = os.path.splitext(source)[0]
+    size, mtime = _source(smb_filepath)
+    catalogue = _read_catalogue(store_dir)
+    converted = _converted(catalogue, smb_filepath)
+    last_end = converted['end'].max() if len(converted) else None
+    chunky = pd.read_csv(smb_filepath,
+                         chunksize=chunksize,
+                         na_values=9999,
+                         delimiter='\t',
+                         encoding='unicode_escape',
+                         low_memory=False)
+    parts = []
+    for i, chunk in enumerate(chunky):
+        if i == 0:
+            # the two lines after the header are not data
+            chunk = chunk.iloc[2:]
+        chunk = chunk.assign(**{'date time': pd.to_datetime(chunk['date time'],
+                                                            format='%Y/%m/%d %H:%M:%S')})
+        if last_end is not None:
+            chunk = chunk[chunk['date time'] > last_end]
+        chunk = _tidy_types(chunk)
+        for key, part in chunk.groupby(chunk['date time'].dt.floor(freq)):
+            # numbered on from the parts of earlier conversions
+            fname = '{}_{}_{:05d}.parquet'.format(stem, key.strftime('%Y%m%d%H'),
+                                                  len(converted) + len(parts))
+            part.to_parquet(os.path.join(store_dir, fname), index=False)
+            parts.append({'file': fname,
+                          'start': part['date time'].min(),
+                          'end': part['date time'].max(),
+                          'rows': len(part)})
+    parts = pd.DataFrame(parts, columns=['file', 'start', 'end', 'rows'])
+    parts = parts.assign(source=source, source_size=size, source_mtime_ns=mtime)
+    if parts.empty and len(converted):
+        # nothing new: record that the log as it is now is in the store
+        catalogue.loc[converted.index[-1], ['source', 'source_size', 'source_mtime_ns']] = \
+            source, size, mtime
+    # written whole and then renamed, so an interrupted run leaves the
+    # previous catalogue
+    fname = os.path.join(store_dir, CATALOGUE)
+    frames = [frame for frame in (catalogue, parts) if len(frame)]
+    rows = pd.concat(frames, ignore_index=True) if frames else parts
+    rows.to_csv(fname + '.tmp', index=False)
+    os.replace(fname + '.tmp', fname)
+    return parts
+
+def read_smb_store(store_dir, windows=None):
+    """Read the SMB log from a store written by convert_smb.
+
+    windows is a list of (start, end) times; only the parts whose time
+    range overlaps a window are read and only rows within a window are
+    kept. Without windows the whole store is read.
+    """
+    catalogue = pd.read_csv(os.path.join(store_dir, CATALOGUE), parse_dates=['start', 'end'])
+    if windows is not None:
+        overlap = pd.Series(False, index=catalogue.index)
+        for start, end in windows:
+            overlap |= (catalogue['start'] <= end) & (catalogue['end'] >= start)
+        catalogue = catalogue[overlap]
+    smb = pd.concat([pd.read_parquet(os.path.join(store_dir, fname))
+                     for fname in catalogue['file']], ignore_index=True)
+    if windows is not None:
+        keep = pd.Series(False, index=smb.index)
+        for start, end in windows:
+            keep |= smb['date time'].between(start, end)
+        smb = smb[keep]
+    return smb.sort_values('date time').reset_index(drop=True)
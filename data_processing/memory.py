@@ -0,0 +1,61 @@
+import pandas as pd
+
+# Repeated strings of the merged UWS frame, stored as categoricals
+UWS_CATEGORICAL = [
+    'filename',
+    'smb_name',
+    'smb_status',
+    'sentence',
+    'WS_sentence',
+    'ns',
+    'ew',
+    'status_ph',
+    'status_temp',
+]
+
+# Sensor values recorded to at most 3 decimals, stored as float32 (about 7
+# significant digits); pH and derived carbonate variables stay float64
+UWS_FLOAT32 = [
+    'temp_cell',
+    'dphi',
+    'signal_intensity',
+    'ambient_light',
+    'ldev',
+    'SBE38_water_temp',
+    'SBE45_water_temp',
+    'SBE45_sal',
+    'SBE45_sv',
+    'SBE_45_C',
+    'insitu_sv',
+    'smb_sv_aml',
+    'smb_tur',
+    'chl',
+    'flow',
+    'depth',
+]
+
+def compact_dtypes(df, categorical=UWS_CATEGORICAL, float32=UWS_FLOAT32):
+    """Copy of df with the categorical columns as pandas categoricals and
+    the float32 columns (parsed as numbers if read as text, values such as
+    '<6.5' becoming NaN) as float32. Columns missing from df are skipped."""
+    df = df.copy()
+    for column in categorical:
+        if column in df:
+            df[column] = df[column].astype('category')
+    for column in float32:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+    return df
+
+def memory_report(before, after):
+    """Memory in bytes of every column of the frame as loaded (before) and
+    with compact dtypes (after, e.g. from compact_dtypes or a compact
+    pipeline run), counting the strings, with a total row. Columns in only
+    one of the frames count as 0 bytes in the other."""
+    report = pd.DataFrame({
+        'before': before.memory_usage(index=False, deep=True),
+        'after': after.memory_usage(index=False, deep=True),
+    }).fillna(0)
+    report.loc['total'] = report.sum()
+    report['ratio'] = report['after'] / report['before']
+    return report
@@ -4,13 +4,14 @@ from data_processing import smb
 from data_processing import salinity
 from data_processing import alkalinity
 
-def raw_process(datasheet_filepath, txt_filepath, smb_filepath):
+def raw_process(datasheet_filepath, txt_filepath, smb_filepath, auto_stabilisation=False,
+                compact=False):
     data_dict, file_list = read_pyrosci(datasheet_filepath, txt_filepath)
-    data = logbook(data_dict, file_list)
-    df = smb(data, smb_filepath)
+    data = logbook(data_dict, file_list, auto_stabilisation=auto_stabilisation, compact=compact)
+    df = smb(data, smb_filepath, compact=compact)
     return df
 
-def bgc_process(df):
+def bgc_process(df, fast=False, lookup=False, cache_dir=None):
     dat_sal = salinity(df)
-    dat_alk = alkalinity(dat_sal)
+    dat_alk = alkalinity(dat_sal, fast=fast, lookup=lookup, cache_dir=cache_dir)
     return dat_alk
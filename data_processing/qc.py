@@ -0,0 +1,22 @@
+import numpy as np, pandas as pd
+
+def hampel_flags(values, window=61, n_sigma_questionable=3, n_sigma_bad=5):
+    """WOCE-style flags from a centred rolling median/MAD (Hampel) filter.
+
+    Each value is compared with the median of the window rows around it,
+    scaled by 1.4826 times the rolling median absolute deviation from that
+    median (a robust standard deviation). Both are pandas rolling medians,
+    O(n log window). Returns flags 2 (good), 3 (beyond
+    n_sigma_questionable), 4 (beyond n_sigma_bad) or 9 (missing). Windows
+    with zero MAD flag nothing.
+    """
+    values = pd.Series(pd.to_numeric(pd.Series(values).to_numpy(), errors='coerce'))
+    median = values.rolling(window, center=True, min_periods=1).median()
+    deviation = (values - median).abs()
+    sigma = 1.4826 * deviation.rolling(window, center=True, min_periods=1).median()
+    flags = np.full(len(values), 2)
+    spread = (sigma > 0).to_numpy()
+    flags[spread & (deviation > n_sigma_questionable * sigma).to_numpy()] = 3
+    flags[spread & (deviation > n_sigma_bad * sigma).to_numpy()] = 4
+    flags[values.isnull().to_numpy()] = 9
+    return flags
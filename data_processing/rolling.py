@@ -0,0 +1,32 @@
+import numpy as np, pandas as pd
+
+def find_gaps(data, threshold=60):
+    """Positions where the time since the previous datetime exceeds
+    threshold minutes, i.e. where continuous segments start."""
+    gaps = np.where(np.diff(data) > np.timedelta64(threshold, 'm'))[0] + 1
+    return gaps
+
+def rolling_stats(df, column, window='30min', threshold=60, by=None, time_col='date_time'):
+    """Time-based rolling mean, standard deviation and count of df[column]
+    in one grouped pass.
+
+    Windows never cross a gap of more than threshold minutes (see
+    find_gaps), nor a change in the by column if given. Rows must be in
+    time order within each segment. Returns a DataFrame with columns mean,
+    std and count on the index of df.
+    """
+    times = pd.to_datetime(df[time_col]).to_numpy()
+    new_segment = np.zeros(len(df), dtype=bool)
+    new_segment[find_gaps(times, threshold=threshold)] = True
+    if by is not None:
+        group = df[by].to_numpy()
+        new_segment[1:] |= group[1:] != group[:-1]
+    segment = np.cumsum(new_segment)
+
+    values = pd.Series(df[column].to_numpy(dtype=float), index=pd.DatetimeIndex(times))
+    stats = (values.groupby(segment, sort=False)
+             .rolling(window)
+             .agg(['mean', 'std', 'count']))
+    # segments are contiguous and in order, so rows line up with df
+    stats.index = df.index
+    return stats
@@ -1,40 +1,53 @@
 import pandas as pd, numpy as np
-from scipy.interpolate import PchipInterpolator
+from collections import deque
+from data_processing.calibration import CalibrationCurve
 
-def salinity(data):  
+# Rows averaged either side of a pump switch, largest offset kept as a
+# PCHIP knot, and offset used before the first knot
+WINDOW = 10
+MAX_OFFSET = 1
+START_OFFSET = 0.404055
+
+def salinity(data, curve_fname=None):
     # Assign nan to SMB name column, then fill with rolling previous pump name
     df = data.copy()
     df.loc[df.smb_name == ' ', 'smb_name'] = np.nan
     df['smb_name'].fillna(method='ffill', inplace=True)
     
-    # Drop 6 outliers in salinity data (before storm)
-    L = (df['date_time'] < '2020-12-25 00:00:00') & (df['date_time'] > '2020-12-15 00:00:00') & (df['SBE45_sal'] < 35.4)
-    df = df[~L]
-    
-    # Find index where pump name changes
-    change_loc = np.where(np.roll(df['smb_name'], 1)!= df['smb_name'])[0].tolist()
-    
-    # Add start and end points to list
-    end = df.index[-1]
-    change_loc.append(end)
+    df = _drop_outliers(df)
     
-    # Create df to hold computed differences
-    points = pd.DataFrame({'location':change_loc})
-    points['point'] = np.nan
-    points['date_time'] = np.nan   
-    
-    for i in range(1, len(change_loc) -1):
-        first = df['SBE45_sal'][change_loc[i-1]:change_loc[i]].iloc[-10:].mean()
-        last = df['SBE45_sal'][change_loc[i]:change_loc[i+1]].iloc[:10].mean()
-        points.loc[points.location==change_loc[i], 'point'] = abs(first - last) / 2
-        points.loc[points.location==change_loc[i], 'date_time'] = df['date_time'][change_loc[i]]
-        print('loop {}: {}, {}'.format(i, first, last))
-
-    # Drop start and end points
+    # Run-length encode pump names: a new run starts wherever the name
+    # changes (rows without a pump name form their own runs)
+    names = df['smb_name'].astype(object).fillna('').to_numpy()
+    run_start = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])
+    run_length = np.diff(np.r_[run_start, len(names)])
+    run_id = np.repeat(np.arange(run_start.size), run_length)
+    position = np.arange(len(names)) - run_start[run_id]
+
+    # Mean salinity over the first and last WINDOW rows of every run
+    sal = df['SBE45_sal'].to_numpy(dtype=float)
+    valid = ~np.isnan(sal)
+    def run_mean(mask):
+        total = np.bincount(run_id, weights=np.where(mask & valid, sal, 0), minlength=run_start.size)
+        count = np.bincount(run_id, weights=mask & valid, minlength=run_start.size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / count
+    head = run_mean(position < WINDOW)
+    tail = run_mean(position >= run_length[run_id] - WINDOW)
+
+    # Half the salinity difference across each pump switch, at the switch
+    switch = (names[run_start[1:]] != '') & (names[run_start[:-1]] != '')
+    points = pd.DataFrame({
+        'location': run_start[1:][switch],
+        'point': np.abs(tail[:-1] - head[1:])[switch] / 2,
+        'date_time': df['date_time'].to_numpy()[run_start[1:][switch]],
+    })
+
+    # Drop switches without a difference
     points.dropna(axis=0, how='any', inplace=True)
     
     # Drop differences during storm for now
-    L = points['point'] < 1
+    L = points['point'] < MAX_OFFSET
     points = points[L]
     
     # Check that datetime colums are datetime objects
@@ -42,32 +55,30 @@ def salinity(data):
     points['date_time'] = pd.to_datetime(points['date_time'])
     
     # PCHIP difference points over date_time range in df
-    points.sort_values(by=['point'], ascending=True)
-    interp_obj = PchipInterpolator(points['date_time'], points['point'], extrapolate=False)
-    df['pchip_salinity'] = interp_obj(df['date_time'])
+    # Before the first point use the first mean point; after the last,
+    # hold the last point, since PCHIP only interpolates in between points
+    curve = CalibrationCurve.fit(points['date_time'], points['point'],
+                                 before=START_OFFSET, after='nearest')
+    df['pchip_salinity'] = curve(df['date_time'])
+    if curve_fname is not None:
+        curve.save(curve_fname)
     
-    # Replace end nan with last pchip value
-    # This is because can only interpolate in between points, not outside
-    df['pchip_salinity'].fillna(method='ffill', inplace=True)
-    
-    # Replace start nan with first mean point
-    df['pchip_salinity'].fillna(0.404055, inplace=True)
-    
-    # Compute the difference between uncorrected salinity and pchip points
-    # df['diff'] = abs(df['SBE45_sal'] - df['pchip_salinity']) / 2
-    
-    # Correct pump A and B
-    # L = df['smb_name'] == 'SMB_A'
-    df['salinity'] = np.nan
-    
-    # Add corrected salinity value to df as a function of pump name
-    pump_name = df['smb_name'].unique().tolist()
-    for name in pump_name:
-        if name == 'SMB_A':
-            df.loc[df['smb_name']=='SMB_A', 'salinity'] = df['SBE45_sal'] - df['pchip_salinity']
-        else:
-            df.loc[df['smb_name']=='SMB_B', 'salinity'] = df['SBE45_sal'] + df['pchip_salinity']
+    return _quality_control(_correct(df))
+
+def _drop_outliers(df):
+    # Drop 6 outliers in salinity data (before storm)
+    L = (df['date_time'] < '2020-12-25 00:00:00') & (df['date_time'] > '2020-12-15 00:00:00') & (df['SBE45_sal'] < 35.4)
+    return df[~L]
+
+def _correct(df):
+    # Correct pumps: subtract the offset for SMB_A, add it for SMB_B;
+    # other (or missing) pump names get no salinity
+    name = df['smb_name'].astype(object)
+    sign = np.select([name == 'SMB_A', name == 'SMB_B'], [-1.0, 1.0], np.nan)
+    df['salinity'] = df['SBE45_sal'] + sign * df['pchip_salinity']
+    return df
 
+def _quality_control(df):
     # === Quality control
     # Add flag
     df['flag_salinity'] = 2
@@ -85,3 +96,158 @@ def salinity(data):
     df.loc[(df['flag_salinity']==4), 'salinity'] = np.nan
 
     return df
+
+class IncrementalSalinity:
+    """Salinity correction for SMB data that arrive in appended chunks, in
+    time order.
+
+    Keeps the pump-switch offset knots, the running pump name and the
+    rows either side of the latest switch as state, so update() only
+    walks the new rows. A switch whose first WINDOW rows have not all
+    arrived gets a provisional knot from the rows so far, as salinity()
+    does at the end of the record. Earlier rows in the PCHIP segments
+    changed by new or updated knots are re-evaluated and set in revised,
+    so the returned rows with their revisions applied match salinity() on
+    all data so far. Only the rows that later knots can still change
+    (from the second-last knot on) are kept for this.
+    """
+
+    def __init__(self):
+        self.knot_times = []
+        self.knot_points = []
+        self.revised = None
+        self._name = None
+        self._fill_name = None
+        self._run_start = None
+        self._tail = deque(maxlen=WINDOW)
+        self._pending = None
+        self._rows = None
+
+    def update(self, data):
+        """Return the new rows of data with pchip_salinity, salinity and
+        flag_salinity, updating the knots with any new pump switches.
+
+        Rows returned by earlier updates whose values change are set in
+        revised, with their original index (empty if there are none).
+        """
+        df = data.copy()
+        df.loc[df.smb_name == ' ', 'smb_name'] = np.nan
+        # Forward fill, with the last name of the previous rows for the
+        # leading blanks
+        df['smb_name'] = df['smb_name'].astype(object).ffill()
+        if self._fill_name is not None:
+            df['smb_name'] = df['smb_name'].fillna(self._fill_name)
+        if df['smb_name'].notnull().any():
+            self._fill_name = df['smb_name'].iloc[-1]
+        df = _drop_outliers(df)
+        df['date_time'] = pd.to_datetime(df['date_time'])
+
+        # Walk the pump runs of the new rows
+        knots = self._knots()
+        names = df['smb_name'].astype(object).fillna('').to_numpy()
+        sal = df['SBE45_sal'].to_numpy(dtype=float)
+        times = df['date_time'].to_numpy()
+        run_start = np.flatnonzero(np.r_[True, names[1:] != names[:-1]]) if len(names) else []
+        for start, stop in zip(run_start, np.r_[run_start[1:], len(names)]):
+            if names[start] != self._name:
+                self._switch(names[start], times[start])
+            if self._pending is not None:
+                head = self._pending['head']
+                head.extend(sal[start:stop][:WINDOW - len(head)])
+                if len(head) == WINDOW:
+                    self._add_knot()
+            self._tail.extend(sal[start:stop][-WINDOW:])
+
+        # Re-evaluate the kept rows from the first changed segment
+        new_knots = self._knots()
+        offset = self._offset(new_knots)
+        changed = self._changed_from(knots, new_knots)
+        rows = self._rows
+        if rows is not None and changed is not None:
+            L = rows['date_time'] >= changed
+            revised = rows[L].assign(pchip_salinity=offset(rows.loc[L, 'date_time']))
+            self.revised = _quality_control(_correct(revised))
+            rows = pd.concat([rows[~L], self.revised])
+        else:
+            self.revised = df.iloc[:0].assign(pchip_salinity=np.nan, salinity=np.nan, flag_salinity=2)
+        df['pchip_salinity'] = offset(df['date_time'])
+        df = _quality_control(_correct(df))
+
+        # Keep the rows that later knots can still change
+        rows = df if rows is None else pd.concat([rows, df])
+        if self._keep_from() is not None:
+            rows = rows[rows['date_time'] >= self._keep_from()]
+        self._rows = rows
+        return df
+
+    def _switch(self, name, time):
+        # A new run ends the previous pending switch, then opens its own
+        if self._pending is not None:
+            self._add_knot()
+        if self._name and name:
+            tail = np.asarray(self._tail)
+            tail = np.nanmean(tail) if np.any(~np.isnan(tail)) else np.nan
+            self._pending = {'tail': tail, 'date_time': time, 'head': []}
+        self._name = name
+        self._run_start = time
+        self._tail.clear()
+
+    def _point(self):
+        # Half the difference across the pending switch
+        head = np.asarray(self._pending['head'])
+        head = np.nanmean(head) if np.any(~np.isnan(head)) else np.nan
+        return abs(self._pending['tail'] - head) / 2
+
+    def _add_knot(self):
+        point = self._point()
+        if point < MAX_OFFSET:
+            self.knot_times.append(self._pending['date_time'])
+            self.knot_points.append(point)
+        self._pending = None
+
+    def _knots(self):
+        """Knot times and points, with the provisional knot of a pending
+        switch."""
+        times, points = list(self.knot_times), list(self.knot_points)
+        if self._pending is not None and self._pending['head'] and self._point() < MAX_OFFSET:
+            times.append(self._pending['date_time'])
+            points.append(self._point())
+        return times, points
+
+    def _changed_from(self, old, new):
+        """Earliest time at which the offset through the new knots can
+        differ from that through the old ones, or None if the knots are
+        unchanged."""
+        d = 0
+        while d < min(len(old[0]), len(new[0])) and old[0][d] == new[0][d] and old[1][d] == new[1][d]:
+            d += 1
+        if d == len(old[0]) == len(new[0]):
+            return None
+        # PCHIP slopes at a knot depend on its neighbours, so a knot that
+        # changes moves the segments from two knots before it
+        i = max(d - 2, 0)
+        return min(times[i] for times in (old[0], new[0]) if len(times) > i)
+
+    def _keep_from(self):
+        # Knots before the second-last fixed one never change again
+        if len(self.knot_times) >= 2:
+            return self.knot_times[-2]
+        if self.knot_times:
+            return self.knot_times[0]
+        return self._run_start
+
+    def _offset(self, knots):
+        """Offset as a function of time, as in salinity(): START_OFFSET
+        before the first knot, PCHIP between knots and the last knot's
+        point after it."""
+        times, points = knots
+        if len(times) >= 2:
+            return CalibrationCurve.fit(times, points, before=START_OFFSET, after='nearest')
+
+        def offset(date_time):
+            date_time = pd.to_datetime(date_time).to_numpy()
+            result = np.full(len(date_time), START_OFFSET)
+            if times:
+                result[date_time >= times[0]] = points[0]
+            return result
+        return offset
@@ -0,0 +1,36 @@
+import pandas as pd
+
+# Nutrient analyser names: 'CTDST01-24-1' or 'CTDST01-N24-1' for the first
+# bottle of a station, then '24-2', '20-1'... until the next station
+NUTRIENT_PATTERN = r'^(?:CTDST(?P<station>\d+)-)?N?(?P<niskin>\d+)-(?P<duplicate>\d+)$'
+
+# VINDTA bottle names: 'STN4N13-1'
+BOTTLE_PATTERN = r'^STN(?P<station>\d+)N(?P<niskin>\d+)-(?P<duplicate>\d+)$'
+
+def parse_sample_names(names, pattern=NUTRIENT_PATTERN, fill_station=True):
+    """Station, niskin and duplicate numbers of CTD sample names.
+
+    The names are matched against pattern (named groups station, niskin
+    and duplicate) in one regex pass over the column. With fill_station,
+    names without a station take that of the last name above them that
+    has one. Returns a DataFrame of nullable integers on the index of
+    names, missing where a name does not match (QC samples, CRMs...).
+    """
+    names = pd.Series(names)
+    parts = names.astype(str).str.strip().str.extract(pattern)
+    if fill_station:
+        # carry the station forward within runs of matching names only
+        matched = parts['niskin'].notnull()
+        parts.loc[matched, 'station'] = parts.loc[matched, 'station'].ffill()
+    return parts[['station', 'niskin', 'duplicate']].apply(pd.to_numeric).astype('Int64')
+
+def sample_key(station, niskin, duplicate=0):
+    """Composite integer key of a station, niskin and duplicate.
+
+    The key is (station * 100 + niskin) * 100 + duplicate, so it is unique
+    for niskin and duplicate numbers below 100 (unlike the concatenated
+    strings, where e.g. station 1, niskin 11 and station 11, niskin 1 both
+    give '111'). With the default duplicate of 0 it is a key of the niskin
+    bottle shared by its duplicates. Works on scalars, arrays and Series.
+    """
+    return (station * 100 + niskin) * 100 + duplicate
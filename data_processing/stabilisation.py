@@ -0,0 +1,48 @@
+import numpy as np, pandas as pd
+
+def transient_mask(df, column='pH_cell', by='filename', time_col='sec',
+                   window=40, max_drift=0.005, sustain=60):
+    """Boolean Series, True for the start-up transient of each deployment.
+
+    The least-squares slope of column against time_col (in seconds) over a
+    trailing window of rows is computed from rolling sums, so the cost is
+    linear in the number of rows. A window is stable if its drift is at
+    most max_drift (units of column per hour). A deployment (group of by;
+    the whole frame if by is None) is stable from the first run of sustain
+    consecutive stable windows, and all rows before that run are flagged,
+    so a single quiet window during the start-up drift is not enough
+    (deployments without such a run are not flagged).
+    Values that do not parse as numbers (e.g. '<6.5') are skipped. Rows
+    must be in time order within each deployment.
+
+    The defaults (20 min windows, 30 min of stability at 30 s sampling)
+    reproduce the per-file manual cuts of the SO279 pH correction to
+    within a factor of two.
+    """
+    group = df[by].to_numpy() if by is not None else np.zeros(len(df))
+    group = pd.Series(pd.factorize(group)[0], index=df.index)
+    position = group.groupby(group).cumcount()
+
+    # time from the start of each deployment keeps the sums well conditioned
+    time = pd.to_numeric(df[time_col], errors='coerce')
+    x = time - time.groupby(group).transform('first')
+    y = pd.to_numeric(df[column], errors='coerce')
+    sums = (pd.DataFrame({'x': x, 'y': y, 'xy': x * y, 'xx': x * x, 'n': y.notnull() * 1.0})
+            .where(y.notnull() & x.notnull())
+            .groupby(group)
+            .rolling(window, min_periods=window // 2)
+            .sum()
+            .reset_index(level=0, drop=True)
+            .reindex(df.index))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = ((sums['n'] * sums['xy'] - sums['x'] * sums['y'])
+                 / (sums['n'] * sums['xx'] - sums['x']**2))
+    # windows without a slope (too few values) are not stable
+    stable = (slope.abs() * 3600 <= max_drift) & (position >= window - 1)
+
+    # end of the first run of sustain stable windows; rows before the
+    # first of those windows are transient
+    run = stable.astype(float).groupby(group).rolling(sustain, min_periods=sustain).min()
+    run = run.reset_index(level=0, drop=True).reindex(df.index) == 1
+    first_run = position.where(run).groupby(group).transform('min')
+    return position < (first_run - sustain - window + 2).fillna(0)
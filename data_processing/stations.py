@@ -0,0 +1,32 @@
+import warnings
+import pandas as pd
+
+def read_stations(fname, date_format='%d.%m.%Y %H:%M'):
+    """Read a station coordinates table (station, [cast,] date, lat, lon),
+    parsing the dates once. Tables without a cast column get cast 1."""
+    stations = pd.read_csv(fname)
+    stations['date'] = pd.to_datetime(stations['date'], format=date_format)
+    if 'cast' not in stations:
+        stations['cast'] = 1
+    return stations.astype({'station': int, 'cast': int})
+
+def join_stations(df, stations, on=('station', 'cast')):
+    """Add the date, latitude and longitude of each sample's station and
+    cast to df with a single keyed merge.
+
+    Samples without a cast column are taken from cast 1. The merge is
+    validated as many samples to one station, so duplicated stations raise
+    pandas.errors.MergeError; stations of df missing from the table are
+    reported with a warning and left without metadata.
+    """
+    on = list(on)
+    if 'cast' in on and 'cast' not in df:
+        df = df.assign(cast=1)
+    metadata = stations[on + ['date', 'lat', 'lon']].rename(
+        columns={'lat': 'latitude', 'lon': 'longitude'})
+    df = df.merge(metadata, how='left', on=on, validate='many_to_one', indicator=True)
+    missing = df.loc[df['_merge'] == 'left_only', on].drop_duplicates()
+    if len(missing):
+        warnings.warn('no coordinates for {}: {}'.format(
+            ', '.join(on), missing.to_records(index=False).tolist()))
+    return df.drop(columns='_merge')
@@ -0,0 +1,183 @@
+import time
+import numpy as np
+from scipy.stats import norm, qmc
+
+def _tile(inputs, n, copies):
+    """Repeat every per-row input copies times along the rows; scalars are
+    left to broadcast."""
+    return {key: np.tile(value, copies) if np.size(value) == n else value
+            for key, value in inputs.items()}
+
+def uniform_sampler(dim, sampler='random', n_iterations=None, seed=None):
+    """Return draw(size), giving a (size, dim) array of uniform (0, 1)
+    deviates from consecutive points of the chosen sequence.
+
+    sampler is 'random' (pseudo-random, numpy global state), 'sobol'
+    (scrambled Sobol, drawn in power-of-two sizes, see sampler_sizes) or 'lhs' (Latin
+    hypercube over all n_iterations points, so n_iterations is required).
+    Map through scipy.stats.norm.ppf for normal perturbations.
+    """
+    if sampler == 'random':
+        return lambda size: np.random.random_sample((size, dim))
+    if sampler == 'sobol':
+        engine = qmc.Sobol(dim, scramble=True, seed=seed)
+        points = None
+    elif sampler == 'lhs':
+        engine = None
+        points = qmc.LatinHypercube(dim, seed=seed).random(n_iterations)
+    else:
+        raise ValueError("sampler must be 'random', 'sobol' or 'lhs'")
+    position = [0]
+
+    def draw(size):
+        if engine is not None:
+            sample = engine.random(size)
+        else:
+            sample = points[position[0]:position[0] + size]
+            position[0] += size
+        # keep away from 0 and 1 so norm.ppf stays finite
+        return np.clip(sample, 1e-12, 1 - 1e-12)
+    return draw
+
+def sampler_sizes(sampler, block_size, n_iterations):
+    """block_size and n_iterations to use with sampler: for 'sobol' both
+    are rounded up to powers of two, so that every block drawn keeps the
+    balance properties of the sequence; unchanged otherwise."""
+    if sampler == 'sobol':
+        block_size = 1 << (int(block_size) - 1).bit_length()
+        n_iterations = 1 << (int(n_iterations) - 1).bit_length()
+    return block_size, n_iterations
+
+class _Welford:
+    """Running per-element mean and sum of squared deviations, merged a
+    block of draws at a time (Chan et al., 1979). NaN draws are skipped."""
+
+    def __init__(self, n):
+        self.count = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+
+    def update(self, block):
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        total = np.where(valid, block, 0).sum(axis=0)
+        mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+        m2 = (np.where(valid, block - mean, 0)**2).sum(axis=0)
+        merged = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(merged > 0, self.mean + delta * count / merged, 0)
+            self.m2 = np.where(merged > 0, self.m2 + m2 + delta**2 * self.count * count / merged, 0)
+        self.count = merged
+
+    def rmse(self, reference=None):
+        """Root mean square deviation from the running mean, or from
+        reference if given."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            msd = self.m2 / self.count
+            if reference is not None:
+                msd = msd + (self.mean - reference)**2
+        return np.sqrt(np.where(self.count > 0, msd, np.nan))
+
+def adaptive_monte_carlo(draw, n, reference=None, rtol=None, block_size=100,
+                         max_iterations=1000, time_budget=None):
+    """Accumulate the per-element RMSE of repeated random draws.
+
+    draw(size) must return an array of shape (size, n). Draws are taken in
+    blocks of block_size and stop at max_iterations, or earlier once the
+    relative change of every finite RMSE over the last block is below rtol,
+    or once time_budget seconds have elapsed. The RMSE is about the mean of
+    the draws, or about reference if given.
+
+    Returns the RMSE array and a dict of convergence diagnostics.
+    """
+    start = time.perf_counter()
+    stats = _Welford(n)
+    rmse = np.full(n, np.nan)
+    n_iterations = 0
+    rel_change = np.inf
+    converged = False
+    while n_iterations < max_iterations:
+        size = min(block_size, max_iterations - n_iterations)
+        stats.update(np.asarray(draw(size)).reshape(size, n))
+        n_iterations += size
+        rmse_previous, rmse = rmse, stats.rmse(reference)
+        finite = np.isfinite(rmse) & np.isfinite(rmse_previous) & (rmse > 0)
+        if finite.any():
+            rel_change = np.max(np.abs(rmse[finite] - rmse_previous[finite]) / rmse[finite])
+            if rtol is not None and rel_change < rtol:
+                converged = True
+                break
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            break
+    diagnostics = {
+        'n_iterations': n_iterations,
+        'converged': converged,
+        'max_relative_change': rel_change,
+        'elapsed_seconds': time.perf_counter() - start,
+    }
+    return rmse, diagnostics
+
+def monte_carlo_uncertainty(func, inputs, uncertainties, n_iterations=1000,
+                            rtol=None, block_size=100, time_budget=None,
+                            sampler='random', seed=None, return_diagnostics=False):
+    """Standard deviation of func(**inputs) per row when each input named
+    in uncertainties is perturbed with normal noise of that size.
+
+    inputs maps keyword arguments of func to per-row arrays or scalars,
+    uncertainties maps some of those names to 1-sigma values. Each block of
+    iterations is evaluated in one batched call of func. With rtol or
+    time_budget set, iterations stop early as in adaptive_monte_carlo and
+    n_iterations is the upper limit. sampler selects pseudo-random or
+    quasi-random ('sobol', 'lhs') perturbations, see uniform_sampler; for
+    'sobol', block_size and n_iterations are rounded up to powers of two
+    (see sampler_sizes).
+    """
+    block_size, n_iterations = sampler_sizes(sampler, block_size, n_iterations)
+    inputs = {key: np.asarray(value) for key, value in inputs.items()}
+    n = max(np.size(value) for value in inputs.values())
+    names = list(uncertainties)
+    uniform = uniform_sampler(len(names) * n, sampler=sampler,
+                              n_iterations=n_iterations, seed=seed)
+
+    def draw(size):
+        perturbed = _tile(inputs, n, size)
+        deviates = norm.ppf(uniform(size)).reshape(size, len(names), n)
+        for i, key in enumerate(names):
+            sigma = np.broadcast_to(uncertainties[key], (n,))
+            perturbed[key] = (np.broadcast_to(perturbed[key], (size * n,))
+                              + (deviates[:, i] * sigma).ravel())
+        return np.asarray(func(**perturbed)).reshape(size, n)
+
+    rmse, diagnostics = adaptive_monte_carlo(draw, n, rtol=rtol, block_size=block_size,
+                                             max_iterations=n_iterations,
+                                             time_budget=time_budget)
+    if return_diagnostics:
+        return rmse, diagnostics
+    return rmse
+
+def linear_uncertainty(func, inputs, uncertainties, step=0.01):
+    """First-order (Jacobian) propagation of uncertainties through func.
+
+    The sensitivity to each input is estimated by central differences of
+    step times its uncertainty, with all perturbed copies stacked into a
+    single batched call of func. Returns the per-row standard deviation,
+    assuming independent input errors.
+    """
+    inputs = {key: np.asarray(value) for key, value in inputs.items()}
+    n = max(np.size(value) for value in inputs.values())
+    names = list(uncertainties)
+    batch = _tile(inputs, n, 2 * len(names))
+    for i, key in enumerate(names):
+        h = step * np.broadcast_to(uncertainties[key], (n,))
+        value = np.broadcast_to(inputs[key], (n,)).astype(float)
+        batch[key] = np.array(np.broadcast_to(batch[key], (2 * len(names) * n,)), dtype=float)
+        batch[key][2 * i * n:(2 * i + 1) * n] = value + h
+        batch[key][(2 * i + 1) * n:(2 * i + 2) * n] = value - h
+    results = np.asarray(func(**batch)).reshape(2 * len(names), n)
+    variance = np.zeros(n)
+    for i, key in enumerate(names):
+        h = step * np.broadcast_to(uncertainties[key], (n,))
+        gradient = (results[2 * i] - results[2 * i + 1]) / (2 * h)
+        variance += (gradient * uncertainties[key])**2
+    return np.sqrt(variance)
@@ -1,101 +1,62 @@
 import pandas as pd
+import data_processing as dp
 
-# Import CTD data 
+# Import CTD data
 df = pd.read_csv('./data/processing/processed_vindta_subsamples.csv')
 
-# Add EXPOCODE column
-df['EXPOCODE'] = '06SN20201204'
-
-# Add cruise ID column
-df['Cruise_ID'] = 'SO279'
-
 # Convert date column to datetime object
 df['date_time'] = pd.to_datetime(df['date_time'])
 
-# Add year, month, day and time columns
-df['Year_UTC'] = df['date_time'].dt.year
-df['Month_UTC'] = df['date_time'].dt.month
-df['Day_UTC'] = df['date_time'].dt.day
-df['Time_UTC'] = df['date_time'].dt.time
-
+# Add EXPOCODE, cruise ID, year, month, day and time columns
+internal = df.assign(EXPOCODE='06SN20201204',
+                     Cruise_ID='SO279',
+                     Year_UTC=df['date_time'].dt.year,
+                     Month_UTC=df['date_time'].dt.month,
+                     Day_UTC=df['date_time'].dt.day,
+                     Time_UTC=df['date_time'].dt.time)
 # Save as is for internal use
-df.to_csv('./data/processing/internal_subsamples_data.csv', index=False)
-
-# Drop useless columns
-columns = [
-    'date_time',
-    'internal_flag_tco2',
-    'duplicate_difference_tco2',
-    'n_duplicates_tco2',
-    'internal_flag_talk',
-    'duplicate_difference_talk',
-    'n_duplicates_talk',
-    'pH_initial_talk'
-    ]
-df.drop(columns, axis =1, inplace=True)
-
-# Replace nans by conventional '-999'
-df.fillna(-999, inplace=True)
-
-# Rename date column
-rn = {
-    'sample':'Sample_ID',
-    'latitude':'Latitude',
-    'longitude':'Longitude',
-    'depth':'Depth',
-    'salinity':'Salinity',
-    'salinity_flag':'Salinity_flag',
-    'temperature':'Temperature',
-    'total_phosphate':'Phosphate',
-    'total_silicate':'Silicate',
-    'total_ammonium':'Ammonium',
-    'total_nitrate_nitrite':'Nitrate_and_Nitrite',
-    'total_nitrite':'Nitrite',
-    'total_nitrate':'Nitrate',
-    'talk':'TA',
-    'flag_talk':'TA_flag',
-    'tco2':'DIC',
-    'flag_tco2':'DIC_flag',
-      }
-
-df.rename(rn, axis=1, inplace=True)
-
-# Reorder columns
-new_index = [
-    'EXPOCODE',
-    'Cruise_ID',
-    'Sample_ID',
-    'Year_UTC',
-    'Month_UTC',
-    'Day_UTC',
-    'Time_UTC',
-    'Latitude',
-    'Longitude',
-    'Depth',
-    'Temperature',
-    'Salinity',
-    'Salinity_flag',
-    'DIC',
-    'DIC_flag',
-    'TA',
-    'TA_flag',
-    'Silicate',
-    'Silicate_flag',
-    'Phosphate',
-    'Phosphate_flag',
-    'Nitrate',
-    'Nitrate_flag',
-    'Nitrite',
-    'Nitrite_flag',
-    'Nitrate_and_Nitrite',
-    'Nitrate_and_Nitrite_flag',
-    'Ammonium',
-    'Ammonium_flag',
-    ]
-df = df.reindex(new_index, axis=1)
-
-# Sort by sample number
-df.sort_values(by=['Sample_ID'], inplace=True)
-
-# Save subsamples dataset to csv
-df.to_csv('./data/SO279_UWS_discrete_samples.csv', index=False)
+dp.write_csv(internal, './data/processing/internal_subsamples_data.csv')
+
+# Output columns, in order, and the columns they come from
+schema = {
+    'columns': {
+        'EXPOCODE': {'value': '06SN20201204'},
+        'Cruise_ID': {'value': 'SO279'},
+        'Sample_ID': 'sample',
+        'Year_UTC': {'date_part': 'year'},
+        'Month_UTC': {'date_part': 'month'},
+        'Day_UTC': {'date_part': 'day'},
+        'Time_UTC': {'date_part': 'time'},
+        'Latitude': 'latitude',
+        'Longitude': 'longitude',
+        'Depth': 'depth',
+        'Temperature': 'temperature',
+        'Salinity': 'salinity',
+        'Salinity_flag': 'salinity_flag',
+        'DIC': 'tco2',
+        'DIC_flag': 'flag_tco2',
+        'TA': 'talk',
+        'TA_flag': 'flag_talk',
+        'Silicate': 'total_silicate',
+        'Silicate_flag': 'Silicate_flag',
+        'Phosphate': 'total_phosphate',
+        'Phosphate_flag': 'Phosphate_flag',
+        'Nitrate': 'total_nitrate',
+        'Nitrate_flag': 'Nitrate_flag',
+        'Nitrite': 'total_nitrite',
+        'Nitrite_flag': 'Nitrite_flag',
+        'Nitrate_and_Nitrite': 'total_nitrate_nitrite',
+        'Nitrate_and_Nitrite_flag': 'Nitrate_and_Nitrite_flag',
+        'Ammonium': 'total_ammonium',
+        'Ammonium_flag': 'Ammonium_flag',
+        },
+    'date_time': 'date_time',
+    # Replace nans by conventional '-999'
+    'fill_value': -999,
+    # Sort by sample number
+    'sort_by': ['Sample_ID'],
+    }
+
+# Save subsamples dataset to csv, parquet and netcdf in one pass
+fnames = ['./data/SO279_UWS_discrete_samples' + extension for extension in ['.csv', '.parquet', '.nc']]
+dp.write_formatted(df, fnames, schema)
@@ -1,4 +1,5 @@
 import pandas as pd, numpy as np
+import data_processing as dp
 import calkulate as calk
 
 # Import subsamples info sheet
@@ -52,19 +53,10 @@ for location in point_location:
 
 # Processing for UWS nutrients
 # Import spreadsheet
-nuts1 = pd.read_excel('./data/nutrients/210301-LouiseD-NP-AR1.xlsx', skiprows=6)
-nuts1 = nuts1.drop(0)
-nuts2 = pd.read_excel('./data/nutrients/210301-LouiseD-NP-BR1.xlsx', skiprows=6)
-nuts2 = nuts2.drop(0)
-all_nuts = [nuts1, nuts2]
-nuts = pd.concat(all_nuts).reset_index(drop=True)
-
-si1 = pd.read_excel('./data/nutrients/210316-LouiseD-Si-AR1.xlsx', skiprows=5)
-si1 = si1.drop(0)
-si2 = pd.read_excel('./data/nutrients/210316-LouiseD-Si-BR1.xlsx', skiprows=5)
-si2 = si2.drop(0)
-all_si = [si1, si2]
-si = pd.concat(all_si).reset_index(drop=True)
+nuts = dp.read_nutrients(['./data/nutrients/210301-LouiseD-NP-AR1.xlsx',
+                          './data/nutrients/210301-LouiseD-NP-BR1.xlsx'])
+si = dp.read_nutrients(['./data/nutrients/210316-LouiseD-Si-AR1.xlsx',
+                        './data/nutrients/210316-LouiseD-Si-BR1.xlsx'])
 
 # Merge nuts and si batches
 nut_data = pd.merge(left=nuts, right=si, how='inner', left_on='METH', right_on='METH')
@@ -111,7 +103,7 @@ subsamples['total_nitrate'] = subsamples['total_nitrate'] /subsamples['density']
 subsamples['total_silicate'] = subsamples['total_silicate'] / subsamples['density']
 
 # Save subsamples df as is for Precision Number computation in outside scripts
-subsamples.to_csv('./data/processing/PN_uws_subsamples.csv', index=False)
+dp.write_csv(subsamples, './data/processing/PN_uws_subsamples.csv')
 
 # === QUALITY CONTROL
 # Add flag column
@@ -314,4 +306,4 @@ subsamples.loc[subsamples['sample_id']=='4a', 'Silicate_flag'] = 3
 subsamples.loc[subsamples['sample_id']=='4b', 'Silicate_flag'] = 3
 
 # Save subsamplessheet to .csv
-subsamples.to_csv('./data/processing/processed_uws_subsamples.csv', index=False)
+dp.write_csv(subsamples, './data/processing/processed_uws_subsamples.csv')
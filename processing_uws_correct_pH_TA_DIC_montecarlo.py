@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-import PyCO2SYS as pyco2
+import data_processing as dp
+from data_processing import carbonate
 
 # Load data
 subsamples = pd.read_csv("./data/processing/processed_vindta_subsamples.csv")
@@ -9,102 +10,144 @@ subsamples = pd.read_csv("./data/processing/processed_vindta_subsamples.csv")
 talk_rmse = 1.1792962721848792
 tco2_rmse = 2.1070920505299284
 
-# Calculate real pH values without adding variability
-real_ph_TA_tCO2 = pyco2.sys(
-    par1=subsamples['talk'].to_numpy(),
-    par2=subsamples['tco2'].to_numpy(),
-    par1_type=1,
-    par2_type=2,
-    opt_pH_scale=1,
-    salinity=subsamples["salinity"].to_numpy(),
-    temperature=subsamples["temperature"].to_numpy()
-)['pH_total']
-
-real_ph_pH_initial_talk_tCO2 = pyco2.sys(
-    par1=subsamples['pH_initial_talk'].to_numpy(),
-    par2=subsamples['tco2'].to_numpy(),
-    par1_type=3,
-    par2_type=2,
-    opt_pH_scale=3,
-    pressure=3,
-    salinity=subsamples["salinity"].to_numpy(),
-    temperature=25,
-    temperature_out=subsamples["temperature"].to_numpy()
-)['pH_total_out']
-
-# Store real pH values in the subsamples DataFrame
-subsamples['pH_real_TA_tCO2'] = real_ph_TA_tCO2
-subsamples['pH_real_initial_talk_tCO2'] = real_ph_pH_initial_talk_tCO2
-
-# Number of Monte Carlo iterations
-n_iterations = 1000
-
-# Initialize DataFrames to store pH values for Monte Carlo simulations
-pH_values_TA_tCO2 = pd.DataFrame({
-    'iteration': np.repeat(np.arange(n_iterations), len(subsamples)),
-    'subsample_index': np.tile(np.arange(len(subsamples)), n_iterations),
-    'pH_total': np.zeros(n_iterations * len(subsamples))
-})
-
-pH_values_pH_initial_talk_tCO2 = pd.DataFrame({
-    'iteration': np.repeat(np.arange(n_iterations), len(subsamples)),
-    'subsample_index': np.tile(np.arange(len(subsamples)), n_iterations),
-    'pH_total': np.zeros(n_iterations * len(subsamples))
-})
+# Uncertainty propagation mode: 'montecarlo' perturbs TA and DIC
+# n_iterations times, 'linear' propagates the RMSEs through the Jacobian
+# of pH in a single batched PyCO2SYS call
+mode = 'montecarlo'
+# In linear mode, optionally cross-check against Monte Carlo on a sample
+crosscheck_size = 0
 
-
-# Monte Carlo simulation
-for i in range(n_iterations):
-    # Generate random samples for TALK and tco2 within +/- RMSE
-    talk_samples = subsamples['talk'] + np.random.normal(0, talk_rmse, subsamples.shape[0])
-    tco2_samples = subsamples['tco2'] + np.random.normal(0, tco2_rmse, subsamples.shape[0])
-
-    # Calculate pH using the randomly sampled TA and tco2
-    ph_results_TA_tCO2 = pyco2.sys(
-        par1=talk_samples.to_numpy(),
-        par2=tco2_samples.to_numpy(),
+# Number of Monte Carlo iterations (upper limit when stopping adaptively)
+n_iterations = 1000
+# Adaptive stopping: stop once every sample's RMSE changes by less than
+# rtol over a block of iterations, or after time_budget seconds
+# (None to always run n_iterations)
+rtol = None
+time_budget = None
+# Iterations per block, a power of two as Sobol sampling needs
+block_size = 128
+# Perturbation sampler: 'random' (pseudo-random), or quasi-random 'sobol'
+# or 'lhs' (Latin hypercube), which converge with fewer iterations
+sampler = 'random'
+# Carbonate solver for the perturbed pH: 'pyco2' (PyCO2SYS for every
+# perturbation) or 'warm' (equilibrium constants computed once per sample,
+# pH iteration warm-started from the unperturbed solution)
+solver = 'pyco2'
+
+def pH_TA_tCO2(talk, tco2, salinity, temperature, cache_dir=None):
+    """pH (total scale) from TA and DIC at in-situ temperature."""
+    return dp.co2sys(
+        par1=talk,
+        par2=tco2,
         par1_type=1,
         par2_type=2,
         opt_pH_scale=1,
-        salinity=subsamples["salinity"].to_numpy(),
-        temperature=subsamples["temperature"].to_numpy()
+        salinity=salinity,
+        temperature=temperature,
+        outputs=['pH_total'],
+        cache_dir=cache_dir,
     )['pH_total']
 
-    # Calculate pH using pH_initial_talk and randomly sampled tco2
-    ph_results_pH_initial_talk_tCO2 = pyco2.sys(
-        par1=subsamples['pH_initial_talk'].to_numpy(),
-        par2=tco2_samples,
+def pH_initial_talk_tCO2(pH_initial_talk, tco2, salinity, temperature, cache_dir=None):
+    """pH (total scale) at in-situ temperature from pH during the TA
+    titration (free scale, 25 degC) and DIC."""
+    return dp.co2sys(
+        par1=pH_initial_talk,
+        par2=tco2,
         par1_type=3,
         par2_type=2,
         opt_pH_scale=3,
         pressure=3,
-        salinity=subsamples["salinity"].to_numpy(),
+        salinity=salinity,
         temperature=25,
-        temperature_out=subsamples["temperature"].to_numpy()
+        temperature_out=temperature,
+        outputs=['pH_total_out'],
+        cache_dir=cache_dir,
     )['pH_total_out']
 
-    # Store results in respective DataFrames
-    pH_values_TA_tCO2.loc[pH_values_TA_tCO2['iteration'] == i, 'pH_total'] = ph_results_TA_tCO2
-    pH_values_pH_initial_talk_tCO2.loc[pH_values_pH_initial_talk_tCO2['iteration'] == i, 'pH_total'] = ph_results_pH_initial_talk_tCO2
+inputs_TA_tCO2 = {
+    'talk': subsamples['talk'].to_numpy(),
+    'tco2': subsamples['tco2'].to_numpy(),
+    'salinity': subsamples['salinity'].to_numpy(),
+    'temperature': subsamples['temperature'].to_numpy(),
+}
+inputs_pH_initial_talk_tCO2 = {
+    'pH_initial_talk': subsamples['pH_initial_talk'].to_numpy(),
+    'tco2': subsamples['tco2'].to_numpy(),
+    'salinity': subsamples['salinity'].to_numpy(),
+    'temperature': subsamples['temperature'].to_numpy(),
+}
+uncertainties_TA_tCO2 = {'talk': talk_rmse, 'tco2': tco2_rmse}
+uncertainties_pH_initial_talk_tCO2 = {'tco2': tco2_rmse}
 
-# Compute the RMSE for each calculation type
-pH_values_TA_tCO2['squared_differences'] = (pH_values_TA_tCO2['pH_total'] - pH_values_TA_tCO2.groupby('subsample_index')['pH_total'].transform('mean'))**2
-rmse_pH_TA_tCO2 = np.sqrt(pH_values_TA_tCO2.groupby('subsample_index')['squared_differences'].mean())
+# Calculate real pH values without adding variability
+# and store them in the subsamples DataFrame
+cache_dir = './data/processing/co2sys_cache'
+subsamples['pH_real_TA_tCO2'] = pH_TA_tCO2(**inputs_TA_tCO2, cache_dir=cache_dir)
+subsamples['pH_real_initial_talk_tCO2'] = pH_initial_talk_tCO2(
+    **inputs_pH_initial_talk_tCO2, cache_dir=cache_dir)
+
+if solver == 'warm':
+    # Only TA and DIC are perturbed, so reuse each sample's constants
+    solve_TA_tCO2 = carbonate.pH_ta_dic_solver(
+        inputs_TA_tCO2['talk'], inputs_TA_tCO2['tco2'],
+        inputs_TA_tCO2['salinity'], inputs_TA_tCO2['temperature'])[0]
+    solve_pH_initial_talk_tCO2 = carbonate.pH_free_dic_solver(
+        inputs_pH_initial_talk_tCO2['pH_initial_talk'], inputs_pH_initial_talk_tCO2['tco2'],
+        inputs_pH_initial_talk_tCO2['salinity'], 25, inputs_pH_initial_talk_tCO2['temperature'],
+        pressure=3, pressure_out=3)[0]
+
+    def pH_TA_tCO2(talk, tco2, salinity, temperature):
+        return solve_TA_tCO2(talk, tco2)
+
+    def pH_initial_talk_tCO2(pH_initial_talk, tco2, salinity, temperature):
+        return solve_pH_initial_talk_tCO2(tco2)
 
-pH_values_pH_initial_talk_tCO2['squared_differences'] = (pH_values_pH_initial_talk_tCO2['pH_total'] - pH_values_pH_initial_talk_tCO2.groupby('subsample_index')['pH_total'].transform('mean'))**2
-rmse_pH_pH_initial_talk_tCO2 = np.sqrt(pH_values_pH_initial_talk_tCO2.groupby('subsample_index')['squared_differences'].mean())
+# Compute the RMSE for each calculation type
+if mode == 'linear':
+    rmse_pH_TA_tCO2 = dp.linear_uncertainty(
+        pH_TA_tCO2, inputs_TA_tCO2, uncertainties_TA_tCO2)
+    rmse_pH_pH_initial_talk_tCO2 = dp.linear_uncertainty(
+        pH_initial_talk_tCO2, inputs_pH_initial_talk_tCO2, uncertainties_pH_initial_talk_tCO2)
+else:
+    kwargs = {'n_iterations': n_iterations, 'rtol': rtol, 'time_budget': time_budget,
+              'block_size': block_size, 'sampler': sampler, 'return_diagnostics': True}
+    rmse_pH_TA_tCO2, diagnostics_TA_tCO2 = dp.monte_carlo_uncertainty(
+        pH_TA_tCO2, inputs_TA_tCO2, uncertainties_TA_tCO2, **kwargs)
+    rmse_pH_pH_initial_talk_tCO2, diagnostics_pH_initial_talk_tCO2 = dp.monte_carlo_uncertainty(
+        pH_initial_talk_tCO2, inputs_pH_initial_talk_tCO2, uncertainties_pH_initial_talk_tCO2, **kwargs)
+
+    # Report achieved iterations and convergence diagnostics
+    diagnostics = pd.DataFrame([diagnostics_TA_tCO2, diagnostics_pH_initial_talk_tCO2],
+                               index=['RMSE_pH_TA_tCO2', 'RMSE_pH_pH_initial_talk_tCO2'])
+    print(diagnostics)
+    diagnostics.to_csv("./data/processing/processed_vindta_subsamples_with_uncertainty_diagnostics.csv")
+
+# Cross-check the linear RMSE against Monte Carlo on a random sample
+if mode == 'linear' and crosscheck_size > 0:
+    sample = np.random.choice(len(subsamples), size=min(crosscheck_size, len(subsamples)), replace=False)
+    for name, func, inputs, uncertainties, rmse in [
+            ('RMSE_pH_TA_tCO2', pH_TA_tCO2, inputs_TA_tCO2,
+             uncertainties_TA_tCO2, rmse_pH_TA_tCO2),
+            ('RMSE_pH_pH_initial_talk_tCO2', pH_initial_talk_tCO2, inputs_pH_initial_talk_tCO2,
+             uncertainties_pH_initial_talk_tCO2, rmse_pH_pH_initial_talk_tCO2)]:
+        rmse_mc = dp.monte_carlo_uncertainty(
+            func, {key: value[sample] for key, value in inputs.items()},
+            uncertainties, n_iterations=n_iterations)
+        print('{}: max |linear - Monte Carlo| = {:.2e}'.format(
+            name, np.max(np.abs(rmse[sample] - rmse_mc))))
 
 # Merge the RMSE data with the original subsamples data
 subsamples['subsample_index'] = subsamples.index  # Add index column if not present
 
 # Create a DataFrame for RMSE values
 rmse_df = pd.DataFrame({
-    'subsample_index': rmse_pH_TA_tCO2.index,
-    'RMSE_pH_TA_tCO2': rmse_pH_TA_tCO2.values,
-    'RMSE_pH_pH_initial_talk_tCO2': rmse_pH_pH_initial_talk_tCO2.values
+    'subsample_index': subsamples.index,
+    'RMSE_pH_TA_tCO2': rmse_pH_TA_tCO2,
+    'RMSE_pH_pH_initial_talk_tCO2': rmse_pH_pH_initial_talk_tCO2
 })
 
 subsamples_with_uncertainty = pd.merge(subsamples, rmse_df, on='subsample_index', how='left')
 
 # Save the merged DataFrame
-subsamples_with_uncertainty.to_csv("./data/processing/processed_vindta_subsamples_with_uncertainty.csv", index=False)
+dp.write_csv(subsamples_with_uncertainty, "./data/processing/processed_vindta_subsamples_with_uncertainty.csv", precision=dp.UWS_PRECISION)
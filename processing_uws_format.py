@@ -1,138 +1,49 @@
 import pandas as pd
-
-# Import continuous pH data 
-# df = pd.read_csv('./data/processing/processed_uws_data.csv')
-df = pd.read_csv('./data/processing/processed_uws_data_with_uncertainty_bootstrapping.csv')
-
-
-# Add EXPOCODE column
-df['EXPOCODE'] = '06SN20201204'
-
-# Add cruise ID column
-df['Cruise_ID'] = 'SO279'
-
-# Convert date column to datetime object
-df['date_time'] = pd.to_datetime(df['date_time'])
-
-# Add year, month, day and time columns
-df['Year_UTC'] = df['date_time'].dt.year
-df['Month_UTC'] = df['date_time'].dt.month
-df['Day_UTC'] = df['date_time'].dt.day
-df['Time_UTC'] = df['date_time'].dt.time
-
-# Add flag column
-df['pH_flag'] = 2
-
-# Drop useless columns
-df.drop(columns=[
-    'index',
-    'date_time',
-    'filename',
-    'sec',
-    'pH_cell',
-    'temp_cell',
-    'dphi',
-    'signal_intensity',
-    'ambient_light',
-    'status_temp',
-    'ldev',
-    'status_ph',
-    'WS_airtemp',
-    'WS_baro',
-    'WS_course',
-    'WS_date',
-    'WS_heading',
-    'WS_humidity',
-    'WS_lat',
-    'WS_lon',
-    'WS_longwave',
-    'WS_normto',
-    'WS_pyrogeometer',
-    'WS_sensorvalue',
-    'WS_sentence',
-    'WS_shortwave',
-    'WS_speed',
-    'WS_timestamp',
-    'WS_watertemp',
-    'WS_winddirection_rel',
-    'WS_winddirection_true',
-    'WS_windspeed_rel',
-    'WS_windspeed_true',
-    'WS_windspeed_true_bft',
-    'chl',
-    'SBE_45_C',
-    'date',
-    'delay',
-    'ew',
-    'flow',
-    'ns',
-    'system',
-    'smb_name',
-    'sentence',
-    'SMB.RSSMB.SMB_SN',
-    'SBE45_sv',
-    'SBE45_sal',
-    'insitu_sv',
-    'smb_status',
-    'smb_sv_aml',
-    'SBE45_water_temp',
-    'smb_time',
-    'smb_tur',
-    'temp_diff',
-    'pH',
-    'pchip_salinity',
-    'ta_est',
-    'pH_insitu_ta_est',
-    'pchip_pH_difference',
-    # 'SMA'
-    ],
-    axis=1,
-    inplace=True)
-
-# Rename columns
-rn = {
-      'lat':'Latitude',
-      'lon':'Longitude',
-      'depth':'Depth',
-      'SBE38_water_temp':'Temperature',
-      'salinity':'Salinity',
-      'flag_salinity':'Salinity_flag',
-      'pH_optode_corrected':'pH_TS_measured (optode)',
-      'pH_optode_corrected_RMSE':'pH_TS_measured (optode) uncertainty'
-      }
-df.rename(rn, axis=1, inplace=True)
-
-# Drop rows where there is no pH corrected values
-df = df[df['pH_TS_measured (optode)'].notna()]
-
-# Replace nans by conventional '-999'
-df.fillna(-999, inplace=True)
-
-# Duplicate Temperature column
-df['TEMP_pH'] = df['Temperature']
-
-# Reorder columns
-new_index = [
-    'EXPOCODE',
-    'Cruise_ID',
-    'Year_UTC',
-    'Month_UTC',
-    'Day_UTC',
-    'Time_UTC',
-    'Latitude',
-    'Longitude',
-    'Depth',
-    'Temperature',
-    'TEMP_pH',
-    'Salinity',
-    'Salinity_flag',
-    'pH_TS_measured (optode)',
-    'pH_TS_measured (optode) uncertainty',
-    'pH_flag'
-    
-    ]
-df = df.reindex(new_index, axis=1)
-
-# Save subsamples dataset to csv
-# df.to_csv('./data/SO279_UWS_time_series.csv', index=False)
-df.to_csv('./data/SO279_UWS_time_series_uncertainty.csv', index=False)
+import data_processing as dp
+
+# Output columns, in order, and the columns of the processed data they come from
+schema = {
+    'columns': {
+        'EXPOCODE': {'value': '06SN20201204'},
+        'Cruise_ID': {'value': 'SO279'},
+        'Year_UTC': {'date_part': 'year'},
+        'Month_UTC': {'date_part': 'month'},
+        'Day_UTC': {'date_part': 'day'},
+        'Time_UTC': {'date_part': 'time'},
+        'Latitude': 'lat',
+        'Longitude': 'lon',
+        'Depth': 'depth',
+        'Temperature': 'SBE38_water_temp',
+        'TEMP_pH': 'SBE38_water_temp',
+        'Salinity': 'salinity',
+        'Salinity_flag': 'flag_salinity',
+        'pH_TS_measured (optode)': 'pH_optode_corrected',
+        'pH_TS_measured (optode) uncertainty': 'pH_optode_corrected_RMSE',
+        'pH_flag': {'value': 2},
+        },
+    'date_time': 'date_time',
+    # Drop rows where there is no pH corrected values
+    'dropna': ['pH_optode_corrected'],
+    # Replace nans by conventional '-999'
+    'fill_value': -999,
+    'precision': {
+        'Latitude': 5,
+        'Longitude': 5,
+        'Temperature': 3,
+        'TEMP_pH': 3,
+        'Salinity': 3,
+        'pH_TS_measured (optode)': 4,
+        'pH_TS_measured (optode) uncertainty': 4,
+        },
+    }
+
+# Import only the needed columns of the continuous pH data, in chunks
+# fname = './data/processing/processed_uws_data.csv'
+fname = './data/processing/processed_uws_data_with_uncertainty_bootstrapping.csv'
+df = pd.read_csv(fname, usecols=dp.schema_usecols(schema), chunksize=100000)
+
+# Save time series to csv, parquet and netcdf in one pass
+# output = './data/SO279_UWS_time_series'
+output = './data/SO279_UWS_time_series_uncertainty'
+fnames = [output + extension for extension in ['.csv', '.parquet', '.nc']]
+dp.write_formatted(df, fnames, schema)
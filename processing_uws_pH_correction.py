@@ -1,6 +1,5 @@
 import pandas as pd, numpy as np
-import PyCO2SYS as pyco2
-from scipy.interpolate import PchipInterpolator
+import data_processing as dp
 import matplotlib.pyplot as plt
 
 # Import UWS continuous pH data
@@ -12,21 +11,27 @@ subsamples = pd.read_csv('./data/processing/processed_vindta_subsamples_with_unc
 # === FAST INCREASES PROCESSING
 # Cut continuous pH data to remove fast, unrealistic pH increases at the 
 # beginning of each PyroScience file (beyond 20 min stablization, which was cut off during the initial raw processing)
-# File #2
-L = (df['filename'] == '2020-12-11_163148_NAPTRAM2020') & (df['sec'] < 3000) & (df['pH_insitu_ta_est'] < 8.094)
-df = df[~L]
-
-# File #3
-L = (df['filename'] == '2020-12-15_214136_NAPTRAM20202') & (df['sec'] < 20000) & (df['pH_insitu_ta_est'] < 8.11) # 8.1125) #& (df['pH_insitu_ta_est'] > 8.0879)
-df = df[~L]
-
-# File #4
-L = (df['filename'] == '2020-12-17_134828_NAPTRAM20203') & (df['sec'] < 6500)
-df = df[~L]
-
-# File 5
-L = (df['filename'] == '2020-12-20_182318_NAPTRAM20205') & (df['sec'] < 10000) & (df['pH_insitu_ta_est'] < 8.105)
-df = df[~L]
+# Either detect the transient of each file automatically from the rolling
+# slopes of pH_cell and dphi, or apply the manual per-file cuts
+auto_stabilisation = False
+if auto_stabilisation:
+    df = df[~dp.transient_mask(df, by='filename')]
+else:
+    # File #2
+    L = (df['filename'] == '2020-12-11_163148_NAPTRAM2020') & (df['sec'] < 3000) & (df['pH_insitu_ta_est'] < 8.094)
+    df = df[~L]
+
+    # File #3
+    L = (df['filename'] == '2020-12-15_214136_NAPTRAM20202') & (df['sec'] < 20000) & (df['pH_insitu_ta_est'] < 8.11) # 8.1125) #& (df['pH_insitu_ta_est'] > 8.0879)
+    df = df[~L]
+
+    # File #4
+    L = (df['filename'] == '2020-12-17_134828_NAPTRAM20203') & (df['sec'] < 6500)
+    df = df[~L]
+
+    # File 5
+    L = (df['filename'] == '2020-12-20_182318_NAPTRAM20205') & (df['sec'] < 10000) & (df['pH_insitu_ta_est'] < 8.105)
+    df = df[~L]
 
 # Convert columns to datetime objects
 df['date_time'] = pd.to_datetime(df['date_time'])
@@ -45,7 +50,7 @@ for location in point_location:
 
 # === pH CALCULATION AND CONVERSION
 # Calculate subsamples pH(TA/DIC) at insitu temperature and pressure
-subsamples['pH_total_talk_tco2_insitu_temp'] = pyco2.sys(
+subsamples['pH_total_talk_tco2_insitu_temp'] = dp.co2sys(
     subsamples.talk,
     subsamples.tco2,
     1,
@@ -55,12 +60,14 @@ subsamples['pH_total_talk_tco2_insitu_temp'] = pyco2.sys(
     pressure_out=3,
     total_phosphate=subsamples.total_phosphate,
     total_silicate=subsamples.total_silicate,
+    outputs=['pH_total_out'],
+    cache_dir='./data/processing/co2sys_cache',
 )['pH_total_out']
 
 # Recalculate pH(initial_talk) at insitu temperature and pressure
 # using TA and DIC 
 # and convert from free scale to total scale
-subsamples['pH_total_initial_talk_tco2_insitu_temp'] = pyco2.sys(
+subsamples['pH_total_initial_talk_tco2_insitu_temp'] = dp.co2sys(
     subsamples.pH_initial_talk,
     subsamples.tco2,
     3,
@@ -71,6 +78,8 @@ subsamples['pH_total_initial_talk_tco2_insitu_temp'] = pyco2.sys(
     pressure_out=3,
     total_phosphate=subsamples.total_phosphate,
     total_silicate=subsamples.total_silicate,
+    outputs=['pH_total_out'],
+    cache_dir='./data/processing/co2sys_cache',
 )['pH_total_out']
 
 # === pH OFFSET CALCULATION
@@ -87,9 +96,26 @@ L = subsamples['diff'].isnull()
 subsamples = subsamples[~L]
 
 # PCHIP difference points over date_time range in df
-subsamples.sort_values(by=['diff'], ascending=True)
-interp_obj = PchipInterpolator(subsamples['date_time'], subsamples['diff'], extrapolate=False)
-df['pchip_pH_difference'] = interp_obj(df['date_time'])
+# (no correction outside the subsample period)
+curve = dp.CalibrationCurve.fit(subsamples['date_time'], subsamples['diff'])
+df['pchip_pH_difference'] = curve(df['date_time'])
+curve.save('./data/processing/pH_correction_curve.npz')
+
+# === CROSS-VALIDATION
+# Leave out each subsample ('sample') or each optode deployment's
+# subsamples ('deployment') in turn, refit the PCHIP and predict the
+# held-out differences (None to skip)
+cross_validation = None
+if cross_validation is not None:
+    if cross_validation == 'deployment':
+        groups = subsamples['date_time'].map(
+            nearest.drop_duplicates('date_time').set_index('date_time')['filename'])
+    else:
+        groups = None
+    residuals = dp.cross_validate(subsamples['date_time'], subsamples['diff'], groups=groups)
+    print('Cross-validation RMSE of pH difference: {:.4f}'.format(
+        np.sqrt(np.nanmean(residuals['residual']**2))))
+    residuals.to_csv('./data/processing/pH_correction_cross_validation.csv', index=False)
 
 # === CORRECTION OF pH CONTINUOUS DATA
 # Correct pH(optode) using PCHIP values
@@ -101,13 +127,13 @@ df = df[~L]
 
 # === SIMPLE MOVING AVERAGE
 # Compute simple moving average (SMA) over period of 30 minutes
-file_list = df['filename'].unique().tolist()
-for file in file_list:
-    df.loc[df['filename']==file, 'SMA'] = df.loc[df['filename']==file, 'pH_optode_corrected'].rolling(60, min_periods=1).mean()
+# within each file and continuous segment
+sma = dp.rolling_stats(df, 'pH_optode_corrected', window='30min', by='filename')
+df['SMA'] = sma['mean']
 
 # Save UWS continuous pH dataset
-df.to_csv('./data/processing/processed_uws_data.csv', index=False)
-subsamples.to_csv('./data/processing/subsamples_pH_correction.csv', index=False)
+dp.write_csv(df, './data/processing/processed_uws_data.csv', precision=dp.UWS_PRECISION)
+dp.write_csv(subsamples, './data/processing/subsamples_pH_correction.csv', precision=dp.UWS_PRECISION)
 
 #%% === Plotting
 # Create figure
@@ -117,7 +143,7 @@ fig, ax = plt.subplots(figsize=(10, 6), dpi=300)
 L = df["SMA"].notnull()
 ax.scatter(df["date_time"][L], df["pH_insitu_ta_est"][L], s=0.1, label="Uncorrected pH", color='xkcd:light pink', alpha=0.6)
 ax.scatter(df["date_time"][L], df["SMA"][L], s=0.1, label="Corrected pH", color='b', alpha=0.6)
-ax.fill_between(df["date_time"][L], df["SMA"][L] - df["pH_optode_corrected"][L].rolling(60, min_periods=1).std(), df["SMA"][L] + df["pH_optode_corrected"][L].rolling(60, min_periods=1).std(), color='b', alpha=0.2)
+ax.fill_between(df["date_time"][L], df["SMA"][L] - sma["std"][L], df["SMA"][L] + sma["std"][L], color='b', alpha=0.2)
 ax.scatter(subsamples["date_time"], subsamples["pH_initial_talk_corr"], color='k', label='Subsamples $pH_{TA/DIC}$', s=20, alpha=0.6, edgecolor='k', zorder=6)
 
 # Format plot
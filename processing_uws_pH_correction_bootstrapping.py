@@ -1,6 +1,6 @@
 import pandas as pd, numpy as np
-import PyCO2SYS as pyco2
-from scipy.interpolate import PchipInterpolator
+import data_processing as dp
+from scipy.stats import norm
 import matplotlib.pyplot as plt
 
 # Import UWS continuous pH data
@@ -12,21 +12,27 @@ subsamples = pd.read_csv('./data/processing/processed_vindta_subsamples_with_unc
 # === FAST INCREASES PROCESSING
 # Cut continuous pH data to remove fast, unrealistic pH increases at the 
 # beginning of each PyroScience file (beyond 20 min stablization, which was cut off during the initial raw processing)
-# File #2
-L = (df['filename'] == '2020-12-11_163148_NAPTRAM2020') & (df['sec'] < 3000) & (df['pH_insitu_ta_est'] < 8.094)
-df = df[~L]
-
-# File #3
-L = (df['filename'] == '2020-12-15_214136_NAPTRAM20202') & (df['sec'] < 20000) & (df['pH_insitu_ta_est'] < 8.11) # 8.1125) #& (df['pH_insitu_ta_est'] > 8.0879)
-df = df[~L]
-
-# File #4
-L = (df['filename'] == '2020-12-17_134828_NAPTRAM20203') & (df['sec'] < 6500)
-df = df[~L]
-
-# File 5
-L = (df['filename'] == '2020-12-20_182318_NAPTRAM20205') & (df['sec'] < 10000) & (df['pH_insitu_ta_est'] < 8.105)
-df = df[~L]
+# Either detect the transient of each file automatically from the rolling
+# slopes of pH_cell and dphi, or apply the manual per-file cuts
+auto_stabilisation = False
+if auto_stabilisation:
+    df = df[~dp.transient_mask(df, by='filename')]
+else:
+    # File #2
+    L = (df['filename'] == '2020-12-11_163148_NAPTRAM2020') & (df['sec'] < 3000) & (df['pH_insitu_ta_est'] < 8.094)
+    df = df[~L]
+
+    # File #3
+    L = (df['filename'] == '2020-12-15_214136_NAPTRAM20202') & (df['sec'] < 20000) & (df['pH_insitu_ta_est'] < 8.11) # 8.1125) #& (df['pH_insitu_ta_est'] > 8.0879)
+    df = df[~L]
+
+    # File #4
+    L = (df['filename'] == '2020-12-17_134828_NAPTRAM20203') & (df['sec'] < 6500)
+    df = df[~L]
+
+    # File 5
+    L = (df['filename'] == '2020-12-20_182318_NAPTRAM20205') & (df['sec'] < 10000) & (df['pH_insitu_ta_est'] < 8.105)
+    df = df[~L]
 
 # Convert columns to datetime objects
 df['date_time'] = pd.to_datetime(df['date_time'])
@@ -45,7 +51,7 @@ for location in point_location:
 
 # === pH CALCULATION AND CONVERSION
 # Calculate subsamples pH(TA/DIC) at insitu temperature and pressure
-subsamples['pH_total_talk_tco2_insitu_temp'] = pyco2.sys(
+subsamples['pH_total_talk_tco2_insitu_temp'] = dp.co2sys(
     subsamples.talk,
     subsamples.tco2,
     1,
@@ -55,12 +61,14 @@ subsamples['pH_total_talk_tco2_insitu_temp'] = pyco2.sys(
     pressure_out=3,
     total_phosphate=subsamples.total_phosphate,
     total_silicate=subsamples.total_silicate,
+    outputs=['pH_total_out'],
+    cache_dir='./data/processing/co2sys_cache',
 )['pH_total_out']
 
 # Recalculate pH(initial_talk) at insitu temperature and pressure
 # using TA and DIC 
 # and convert from free scale to total scale
-subsamples['pH_total_initial_talk_tco2_insitu_temp'] = pyco2.sys(
+subsamples['pH_total_initial_talk_tco2_insitu_temp'] = dp.co2sys(
     subsamples.pH_initial_talk,
     subsamples.tco2,
     3,
@@ -71,6 +79,8 @@ subsamples['pH_total_initial_talk_tco2_insitu_temp'] = pyco2.sys(
     pressure_out=3,
     total_phosphate=subsamples.total_phosphate,
     total_silicate=subsamples.total_silicate,
+    outputs=['pH_total_out'],
+    cache_dir='./data/processing/co2sys_cache',
 )['pH_total_out']
 
 # === pH OFFSET CALCULATION
@@ -87,9 +97,9 @@ L = subsamples['diff'].isnull()
 subsamples = subsamples[~L]
 
 # PCHIP difference points over date_time range in df
-subsamples.sort_values(by=['diff'], ascending=True)
-interp_obj = PchipInterpolator(subsamples['date_time'], subsamples['diff'], extrapolate=False)
-df['pchip_pH_difference'] = interp_obj(df['date_time'])
+# (no correction outside the subsample period)
+curve = dp.CalibrationCurve.fit(subsamples['date_time'], subsamples['diff'])
+df['pchip_pH_difference'] = curve(df['date_time'])
 
 # === CORRECTION OF pH CONTINUOUS DATA
 # Correct pH(optode) using PCHIP values
@@ -100,16 +110,36 @@ L = (df['filename'] == '2020-12-20_182318_NAPTRAM20205') & (df['pH_optode_correc
 df = df[~L]
 
 # Bootstrap analysis for uncertainty estimation
+# Number of bootstrap iterations (upper limit when stopping adaptively)
 n_iterations = 100
-bootstrapped_ph_lists = []
-
-for iteration in range(n_iterations):
+# Adaptive stopping: stop once every RMSE changes by less than rtol over
+# a block of iterations, or after time_budget seconds
+# (None to always run n_iterations)
+rtol = None
+time_budget = None
+block_size = 10
+# Resampling and perturbation sampler: 'random' (pseudo-random), or
+# quasi-random 'sobol' or 'lhs' (Latin hypercube)
+sampler = 'random'
+# Sobol blocks and total are rounded up to powers of two
+block_size, n_iterations = dp.sampler_sizes(sampler, block_size, n_iterations)
+
+# Each iteration draws, with replacement, half of the subsamples and two
+# normal perturbations per drawn subsample from one point of the sampler
+n_sampled = int(round(0.5 * len(subsamples)))
+uniform = dp.uniform_sampler(3 * n_sampled, sampler=sampler, n_iterations=n_iterations)
+
+def bootstrap_iteration(u):
+    """Corrected optode pH from one resampled, perturbed set of subsamples,
+    given a point u of 3 * n_sampled uniform deviates."""
     # Sample a fraction of the subsamples DataFrame
-    sampled_subsamples = subsamples.sample(frac=0.5, replace=True)
+    rows = np.minimum((u[:n_sampled] * len(subsamples)).astype(int), len(subsamples) - 1)
+    sampled_subsamples = subsamples.iloc[rows].copy()
 
     # Introduce variability within RMSE
-    sampled_subsamples['pH_real_TA_tCO2_adjusted'] = sampled_subsamples['pH_real_TA_tCO2'] + np.random.normal(0, sampled_subsamples['RMSE_pH_TA_tCO2'], size=len(sampled_subsamples))
-    sampled_subsamples['pH_real_initial_talk_tCO2_adjusted'] = sampled_subsamples['pH_real_initial_talk_tCO2'] + np.random.normal(0, sampled_subsamples['RMSE_pH_pH_initial_talk_tCO2'], size=len(sampled_subsamples))
+    deviates = norm.ppf(u[n_sampled:]).reshape(2, n_sampled)
+    sampled_subsamples['pH_real_TA_tCO2_adjusted'] = sampled_subsamples['pH_real_TA_tCO2'] + deviates[0] * sampled_subsamples['RMSE_pH_TA_tCO2']
+    sampled_subsamples['pH_real_initial_talk_tCO2_adjusted'] = sampled_subsamples['pH_real_initial_talk_tCO2'] + deviates[1] * sampled_subsamples['RMSE_pH_pH_initial_talk_tCO2']
 
     # Recalculate offsets and corrections
     sampled_subsamples['offset'] = abs(sampled_subsamples['pH_real_TA_tCO2_adjusted'] - sampled_subsamples['pH_real_initial_talk_tCO2_adjusted'])
@@ -128,23 +158,28 @@ for iteration in range(n_iterations):
     # Sort by date_time
     sampled_subsamples = sampled_subsamples.sort_values(by='date_time')
 
-    interp_obj = PchipInterpolator(sampled_subsamples['date_time'], sampled_subsamples['diff'], extrapolate=False)
-    df_iteration = df.copy()
-    df_iteration['pchip_pH_difference'] = interp_obj(df_iteration['date_time'])
-    df_iteration['pH_optode_corrected'] = df['pH_insitu_ta_est'] - df_iteration['pchip_pH_difference']
-
-    # Append the series to the list
-    bootstrapped_ph_lists.append(df_iteration['pH_optode_corrected'].rename(f'iteration_{iteration}'))
-
-# Concatenate all data into the DataFrame at once after the loop
-bootstrapped_ph_values = pd.concat(bootstrapped_ph_lists, axis=1)
-
-# Compute mean and standard deviation of corrected pH values
-df['pH_optode_corrected_RMSE'] = np.sqrt((bootstrapped_ph_values.subtract(df['pH_optode_corrected'], axis=0) ** 2).mean(axis=1))
+    curve = dp.CalibrationCurve.fit(sampled_subsamples['date_time'], sampled_subsamples['diff'])
+    return df['pH_insitu_ta_est'].to_numpy() - curve(df['date_time'])
+
+# Accumulate the RMSE of the bootstrapped corrected pH around the
+# corrected pH block by block
+df['pH_optode_corrected_RMSE'], diagnostics = dp.adaptive_monte_carlo(
+    lambda size: np.array([bootstrap_iteration(u) for u in uniform(size)]),
+    len(df),
+    reference=df['pH_optode_corrected'].to_numpy(),
+    rtol=rtol,
+    block_size=block_size,
+    max_iterations=n_iterations,
+    time_budget=time_budget,
+    )
+
+# Report achieved iterations and convergence diagnostics
+print(diagnostics)
+pd.Series(diagnostics).to_csv('./data/processing/processed_uws_data_with_uncertainty_bootstrapping_diagnostics.csv', header=False)
 
 # Save the DataFrame with corrected pH values and uncertainty
 # df.to_csv('./data/processing/uws_data_with_corrected_pH.csv')
-df.to_csv('./data/processing/processed_uws_data_with_uncertainty_bootstrapping.csv')
+dp.write_csv(df, './data/processing/processed_uws_data_with_uncertainty_bootstrapping.csv', precision=dp.UWS_PRECISION, index=True)
 
 #%% === Plotting
 # Create figure
@@ -154,21 +189,20 @@ fig, ax = plt.subplots(figsize=(10, 6), dpi=300)
 L = df["pH_optode_corrected"].notnull()
 df_filtered = df[L]
 
-# Function to find gaps in datetime series
-def find_gaps(data, threshold=60):
-    gaps = np.where(np.diff(data) > np.timedelta64(threshold, 'm'))[0] + 1
-    return gaps
+# Rolling 30 minute mean of corrected pH within continuous segments
+sma = dp.rolling_stats(df_filtered, 'pH_optode_corrected', window='30min')
 
 # Split data into continuous segments
-continuous_segments = np.split(df_filtered, find_gaps(df_filtered['date_time'].values))
+segment_starts = dp.find_gaps(df_filtered['date_time'].values)
+continuous_segments = zip(np.split(df_filtered, segment_starts), np.split(sma['mean'], segment_starts))
 
 # Plot each continuous segment separately
-for segment in continuous_segments:
+for segment, segment_sma in continuous_segments:
     ax.scatter(segment["date_time"], segment["pH_insitu_ta_est"], s=0.1, label="Uncorrected pH", color='xkcd:light pink', alpha=0.6)
-    ax.scatter(segment["date_time"], segment["pH_optode_corrected"].rolling(60, min_periods=1).mean(), s=0.1, label="Corrected pH", color='b', alpha=0.6)
+    ax.scatter(segment["date_time"], segment_sma, s=0.1, label="Corrected pH", color='b', alpha=0.6)
     ax.fill_between(segment["date_time"], 
-                    segment["pH_optode_corrected"].rolling(60, min_periods=1).mean() - segment["pH_optode_corrected_RMSE"], 
-                    segment["pH_optode_corrected"].rolling(60, min_periods=1).mean() + segment["pH_optode_corrected_RMSE"], 
+                    segment_sma - segment["pH_optode_corrected_RMSE"], 
+                    segment_sma + segment["pH_optode_corrected_RMSE"], 
                     color='b', alpha=0.2)
 
 # Scatter plot for subsamples
@@ -197,6 +231,6 @@ custom_handles = [
 plt.show()
 
 # Save the DataFrame with corrected pH values and uncertainty for plotting
-df.to_csv('./data/processing/PLOTTING_processed_uws_data_with_uncertainty_bootstrapping.csv', index=False)
-subsamples.to_csv('./data/processing/PLOTTING_subsamples_with_corrections.csv', index=False)
+dp.write_csv(df, './data/processing/PLOTTING_processed_uws_data_with_uncertainty_bootstrapping.csv', precision=dp.UWS_PRECISION)
+dp.write_csv(subsamples, './data/processing/PLOTTING_subsamples_with_corrections.csv', precision=dp.UWS_PRECISION)
 
@@ -1,11 +1,30 @@
 import data_processing as dp
 
+# Use categoricals, float32 and datetime64 from ingestion to roughly halve memory
+compact = False
+# With compact, print the memory saved per column (reads the data a second
+# time with default dtypes to measure it)
+report_memory = False
+
+# Split the ship's SMB log into a daily store, so that only the days of the
+# optode deployments are read; when the log has changed since it was last
+# converted, its new rows are added to the store
+smb_log = './data/SMB/smb_all_hr.dat'
+smb_store = './data/SMB/smb_store'
+if not dp.smb_store_current(smb_log, smb_store):
+    dp.convert_smb(smb_log, smb_store, freq='D')
+
 # Import raw continuous optode measurements (optional: process it // time-consuming)
-df = dp.raw_process('./data/pH/UWS/UWS_continuous_file_list.xlsx', './data/pH/UWS', 'data/SMB/smb_all_hr.dat')
+df = dp.raw_process('./data/pH/UWS/UWS_continuous_file_list.xlsx', './data/pH/UWS', smb_store,
+                    compact=compact)
+if compact and report_memory:
+    loaded = dp.raw_process('./data/pH/UWS/UWS_continuous_file_list.xlsx', './data/pH/UWS', smb_store)
+    print(dp.memory_report(loaded, df))
+    del loaded
 # Save pre BGC processing data
-df.to_csv('./data/processing/preprocessing_uws_data.csv', index=False)
+dp.write_csv(df, './data/processing/preprocessing_uws_data.csv', precision=dp.UWS_PRECISION)
 
 # Correct salinity and estimate alkalinity
-df = dp.bgc_process(df)
+df = dp.bgc_process(df, cache_dir='./data/processing/co2sys_cache')
 # Save raw UWS data
-df.to_csv('./data/processing/raw_uws_data.csv', index=False)
+dp.write_csv(df, './data/processing/raw_uws_data.csv', precision=dp.UWS_PRECISION)
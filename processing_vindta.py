@@ -1,7 +1,8 @@
 import copy
 import numpy as np, pandas as pd
 from matplotlib import pyplot as plt
-import PyCO2SYS as pyco2, koolstof as ks, calkulate as calk
+import koolstof as ks, calkulate as calk
+import data_processing as dp
 from koolstof import vindta as ksv
 
 # Import logfile and dbs file
@@ -56,41 +57,16 @@ dbs.loc[np.isin(dbs.bottle, ["CRM-189-0285-3"]), "file_good"] = False
 ctd_data = pd.read_csv('./data/processing/processed_ctd_data.csv')
 
 # Extract station, niskin and duplicate numbers from bottle names in dbs file
-sample_list = dbs['bottle'].tolist()
-sample_station = []
-sample_niskin = []
-sample_duplicate = []
-for sample in sample_list:
-    if sample.startswith('STN'):
-        stn = sample[3]
-        nsk = sample[5:7]
-        dup = sample[-1]
-        sample_station.append(stn)
-        sample_niskin.append(nsk)
-        sample_duplicate.append(dup)
-    else:
-        sample_station.append('0')
-        sample_niskin.append('0')
-        sample_duplicate.append('0')
-
-dbs['station_r'] = sample_station
-dbs['niskin_r'] = sample_niskin
-dbs['duplicate'] = sample_duplicate
-
-dbs['niskin_r'] = dbs['niskin_r'].str.lstrip('0')
-dbs['niskin_r'] = dbs['niskin_r'].replace('', '0')
-
-dbs['stncode'] = dbs['station_r'] + dbs['niskin_r'] + dbs['duplicate']
-dbs['stncode'] = dbs['stncode'].astype(str)
-dbs.replace(to_replace='nannannan', value=np.nan, inplace=True)
+# (missing for CRMs, junks and subsamples)
+bottles = dp.parse_sample_names(dbs['bottle'], pattern=dp.samples.BOTTLE_PATTERN, fill_station=False)
+dbs['duplicate'] = bottles['duplicate']
+dbs['stncode'] = dp.sample_key(bottles['station'], bottles['niskin'], bottles['duplicate'])
 
 # Remove bottle STN4N13-1 from TA/DIC sample list as bottle broke during sample processing on ship
-ctd_data['stncode'] = ctd_data['stncode'].astype(str)
-ctd_data['stncode'] = ctd_data['stncode'].map(lambda x: x.rstrip('.0'))
-code_list = ctd_data['stncode']
-L = code_list == '4131' 
+ctd_data['stncode'] = ctd_data['stncode'].astype('Int64')
+code_list = ctd_data['stncode'].dropna()
+L = code_list == dp.sample_key(4, 13, 1)
 code_list = code_list[~L].tolist() # drop bottle STN4N13-1 as bottle broke during processing
-code_list = list(filter(lambda x: str(x) != 'nan', code_list))
 
 # Assign salinity and nutrients to dbs columns
 for code in code_list:
@@ -205,7 +181,7 @@ calk.plot.alkalinity_offset(dbs, figure_fname="figs/vindta/alkalinity_offset.png
 dbs = pd.DataFrame(dbs)
 
 # Compare initial pH measurement with PyCO2SYS value from TA & DIC
-dbs["pH_alk_dic_25"] = pyco2.sys(
+dbs["pH_alk_dic_25"] = dp.co2sys(
     dbs.alkalinity.to_numpy(),
     dbs.dic.to_numpy(),
     1,
@@ -214,6 +190,7 @@ dbs["pH_alk_dic_25"] = pyco2.sys(
     salinity=dbs.salinity.to_numpy(),
     total_phosphate=dbs.total_phosphate.to_numpy(),
     total_silicate=dbs.total_silicate.to_numpy(),
+    outputs=["pH_free"],
 )["pH_free"]
 
 # Plot pH comparison
@@ -573,9 +550,7 @@ for code in code_list:
     ctd_data_talk.loc[ctd_data_talk['stncode']==code, 'pH_initial_talk'] = dbs.loc[dbs['stncode']==code, 'pH_initial'].values
 
 # Compute differences for each duplicate pair
-ctd_data_talk['station'] = ctd_data_talk['station'].astype(str)
-ctd_data_talk['niskin'] = ctd_data_talk['niskin'].astype(str)
-ctd_data_talk['dupcode'] = ctd_data_talk['station'] + ctd_data_talk['niskin']
+ctd_data_talk['dupcode'] = dp.sample_key(ctd_data_talk['station'], ctd_data_talk['niskin'])
 
 sample_list = ctd_data_talk['dupcode'].unique().tolist()
 for sample in sample_list:
@@ -591,8 +566,8 @@ for sample in sample_list:
 # Remove sample '4131' as no TA/DIC (broken bottle)
 # Assign difference = nan and number of duplicates = 1 for other duplicate of pair
 ctd_data_talk.dropna(subset=['talk'], how='all', inplace=True)
-ctd_data_talk.loc[ctd_data_talk['dupcode']=='4132', 'difference'] = np.nan
-ctd_data_talk.loc[ctd_data_talk['dupcode']=='413', 'number_of_duplicates'] = 1
+ctd_data_talk.loc[ctd_data_talk['dupcode']==dp.sample_key(4, 13), 'difference'] = np.nan
+ctd_data_talk.loc[ctd_data_talk['dupcode']==dp.sample_key(4, 13), 'number_of_duplicates'] = 1
 
 # Calculate precision number for TA (CTD data)
 P_ctd_talk = (np.sqrt(np.pi)/2) * (np.abs(ctd_data_talk['difference'].mean()))
@@ -638,9 +613,7 @@ L = ctd_data_tco2['flag_tco2'] == 2
 ctd_data_tco2 = ctd_data_tco2[L]
 
 # Compute differences for each duplicate pair
-ctd_data_tco2['station'] = ctd_data_tco2['station'].astype(str)
-ctd_data_tco2['niskin'] = ctd_data_tco2['niskin'].astype(str)
-ctd_data_tco2['dupcode'] = ctd_data_tco2['station'] + ctd_data_tco2['niskin']
+ctd_data_tco2['dupcode'] = dp.sample_key(ctd_data_tco2['station'], ctd_data_tco2['niskin'])
 sample_list = ctd_data_tco2['dupcode'].unique().tolist()
 
 for sample in sample_list:
@@ -656,8 +629,8 @@ for sample in sample_list:
 # Remove sample '4131' as no TA/DIC (broken bottle)
 # Assign difference = nan and number of duplicates = 1 for other duplicate of pair
 ctd_data_tco2.dropna(subset=['tco2'], how='all', inplace=True)
-ctd_data_tco2.loc[ctd_data_tco2['dupcode']=='4132', 'difference'] = np.nan
-ctd_data_tco2.loc[ctd_data_tco2['dupcode']=='413', 'number_of_duplicates'] = 1
+ctd_data_tco2.loc[ctd_data_tco2['dupcode']==dp.sample_key(4, 13), 'difference'] = np.nan
+ctd_data_tco2.loc[ctd_data_tco2['dupcode']==dp.sample_key(4, 13), 'number_of_duplicates'] = 1
 
 # Calculate precision number for DIC (CTD data)
 P_ctd_tco2 = (np.sqrt(np.pi)/2) * (np.abs(ctd_data_tco2['difference'].mean()))
@@ -709,6 +682,6 @@ ctd_data.rename(rn, axis=1, inplace=True)
 
 
 # Save CTD and UWS datasets to csv.
-subsamples.to_csv('./data/processing/processed_vindta_subsamples.csv', index=False)
-ctd_data.to_csv('./data/processing/processed_vindta_ctd.csv', index=False)
-dbs.to_csv('./data/processing/dbs.csv', index=False)
+dp.write_csv(subsamples, './data/processing/processed_vindta_subsamples.csv')
+dp.write_csv(ctd_data, './data/processing/processed_vindta_ctd.csv')
+dp.write_csv(dbs, './data/processing/dbs.csv')
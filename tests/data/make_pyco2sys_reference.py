@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import PyCO2SYS as pyco2
+
+# Write pyco2sys_reference.csv, the PyCO2SYS outputs that the specialised
+# solvers of data_processing.carbonate are checked against (tests/test_carbonate.py).
+# Inputs span the SO279 underway and subsample conditions; run again from
+# the repository root after upgrading PyCO2SYS.
+rng = np.random.default_rng(279)
+n = 24
+ref = pd.DataFrame({
+    'salinity': rng.uniform(33, 37.5, n),
+    'temperature': rng.uniform(8, 30, n),
+    'temperature_out': rng.uniform(8, 30, n),
+    'ta': rng.uniform(2250, 2450, n),
+    'dic': rng.uniform(1950, 2200, n),
+    'pH': rng.uniform(7.8, 8.2, n),
+}).round(4)
+
+# alkalinity(): pH(TA, pH) at SBE38 temperature and 3 dbar
+ref['pH_total_out'] = pyco2.sys(ref.ta, ref.pH, 1, 3,
+                                salinity=ref.salinity,
+                                temperature=ref.temperature,
+                                temperature_out=ref.temperature_out,
+                                pressure=0,
+                                pressure_out=3,
+                                opt_pH_scale=1,
+                                opt_k_carbonic=16,
+                                opt_total_borate=1)['pH_total_out']
+# uncertainty scripts: pH(TA, DIC) and pH(pH_free, DIC)
+ref['pH_ta_dic'] = pyco2.sys(ref.ta, ref.dic, 1, 2,
+                             salinity=ref.salinity,
+                             temperature=ref.temperature,
+                             opt_pH_scale=1,
+                             opt_k_carbonic=10)['pH_total']
+ref['pH_free_dic_out'] = pyco2.sys(ref.pH, ref.dic, 3, 2,
+                                   salinity=ref.salinity,
+                                   temperature=ref.temperature,
+                                   temperature_out=ref.temperature_out,
+                                   opt_pH_scale=3,
+                                   opt_k_carbonic=10)['pH_total_out']
+
+with open('./tests/data/pyco2sys_reference.csv', 'w', newline='') as f:
+    f.write('# PyCO2SYS {}\n'.format(pyco2.__version__))
+    ref.to_csv(f, index=False, float_format='%.15g')
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from data_processing import carbonate
+
+# PyCO2SYS outputs written by tests/data/make_pyco2sys_reference.py
+REFERENCE = pd.read_csv(os.path.join(os.path.dirname(__file__), 'data', 'pyco2sys_reference.csv'),
+                        comment='#')
+
+
+def test_pH_total_out_matches_pyco2sys():
+    pH = carbonate.pH_total_out(REFERENCE.ta, REFERENCE.pH,
+                                salinity=REFERENCE.salinity,
+                                temperature=REFERENCE.temperature,
+                                temperature_out=REFERENCE.temperature_out,
+                                pressure=0, pressure_out=3)
+    np.testing.assert_allclose(pH, REFERENCE.pH_total_out, rtol=0, atol=1e-6)
+
+
+def test_pH_ta_dic_solver_matches_pyco2sys():
+    _, pH = carbonate.pH_ta_dic_solver(REFERENCE.ta, REFERENCE.dic,
+                                       REFERENCE.salinity, REFERENCE.temperature)
+    np.testing.assert_allclose(pH, REFERENCE.pH_ta_dic, rtol=0, atol=1e-6)
+
+
+def test_pH_free_dic_solver_matches_pyco2sys():
+    _, pH = carbonate.pH_free_dic_solver(REFERENCE.pH, REFERENCE.dic,
+                                         REFERENCE.salinity, REFERENCE.temperature,
+                                         REFERENCE.temperature_out)
+    np.testing.assert_allclose(pH, REFERENCE.pH_free_dic_out, rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize('bad', ['ta', 'k_1'])
+def test_pH_from_ta_dic_gives_nan_for_bad_rows(bad):
+    k = carbonate.constants(np.full(3, 35.), np.full(3, 20.), 0)
+    ta = np.full(3, 2300e-6)
+    if bad == 'ta':
+        ta[1] = np.nan
+    else:
+        k['k_1'] = k['k_1'].copy()
+        k['k_1'][1] = np.nan
+    pH = carbonate.pH_from_ta_dic(ta, np.full(3, 2000e-6), k)
+    assert np.isnan(pH[1])
+    assert np.isfinite(pH[[0, 2]]).all()
+
+
+def test_pH_from_ta_dic_gives_up_after_max_iterations(monkeypatch):
+    # too few steps to converge from the default guess
+    monkeypatch.setattr(carbonate, 'MAX_ITERATIONS', 1)
+    k = carbonate.constants(35., 20., 0)
+    assert np.isnan(carbonate.pH_from_ta_dic(2300e-6, 2000e-6, k))
+
+
+def test_pH_total_out_lookup_matches_exact():
+    kwargs = dict(salinity=REFERENCE.salinity, temperature=REFERENCE.temperature,
+                  temperature_out=REFERENCE.temperature_out, pressure=0, pressure_out=3)
+    exact = carbonate.pH_total_out(REFERENCE.ta, REFERENCE.pH, **kwargs)
+    interpolated = carbonate.pH_total_out(REFERENCE.ta, REFERENCE.pH, lookup=True, **kwargs)
+    np.testing.assert_allclose(interpolated, exact, rtol=0,
+                               atol=carbonate.LOOKUP_RTOL / np.log(10))
+    np.testing.assert_allclose(interpolated, REFERENCE.pH_total_out, rtol=0, atol=1e-6)
+
+
+def test_constants_table_is_built_once():
+    table = carbonate.constants_table([35, 36], [10, 20], 3)
+    assert carbonate.constants_table([35, 36], [10, 20], 3) is table
+    assert carbonate.constants_table([35, 36], [10, 20], 0) is not table
+    assert max(table['max_relative_error'].values()) <= carbonate.LOOKUP_RTOL
+
+
+def test_pH_total_out_lookup_checks_error_bound(monkeypatch):
+    monkeypatch.setattr(carbonate, 'LOOKUP_RTOL', 1e-12)
+    with pytest.raises(ValueError):
+        carbonate.pH_total_out(2300, 8.0, 35, 20, 25, lookup=True)
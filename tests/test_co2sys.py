@@ -0,0 +1,45 @@
+import importlib
+import numpy as np
+from data_processing.co2sys import co2sys
+
+# the module, which the package's co2sys function shadows
+co2sys_module = importlib.import_module('data_processing.co2sys')
+
+
+def test_co2sys_empty_input():
+    results = co2sys([], [], 1, 2, outputs=['pH_total', 'pCO2'],
+                     salinity=[], temperature=25, opt_k_carbonic=10)
+    assert set(results) == {'pH_total', 'pCO2'}
+    assert all(value.shape == (0,) for value in results.values())
+
+
+def test_co2sys_chunks_match_single_call():
+    ta = np.linspace(2250, 2450, 7)
+    dic = np.linspace(1950, 2150, 7)
+    whole = co2sys(ta, dic, 1, 2, outputs='pH_total', salinity=35, temperature=20)
+    chunked = co2sys(ta, dic, 1, 2, outputs='pH_total', salinity=35, temperature=20,
+                     chunk_size=3)
+    np.testing.assert_array_equal(chunked['pH_total'], whole['pH_total'])
+
+
+def test_co2sys_cache(tmp_path, monkeypatch):
+    calls = []
+    sys = co2sys_module.pyco2.sys
+
+    def counting_sys(*args, **kwargs):
+        calls.append(1)
+        return sys(*args, **kwargs)
+    monkeypatch.setattr(co2sys_module.pyco2, 'sys', counting_sys)
+
+    def run(ta):
+        return co2sys(ta, [2000, 2050], 1, 2, outputs=['pH_total'], salinity=35,
+                      temperature=20, cache_dir=str(tmp_path))
+
+    first = run([2300, 2350])
+    second = run([2300, 2350])
+    assert len(calls) == 1
+    np.testing.assert_array_equal(second['pH_total'], first['pH_total'])
+    run([2300, 2400])
+    assert len(calls) == 2
+    assert len(list(tmp_path.glob('*.npz'))) == 2
+    assert not (tmp_path / 'pH_total.npz').exists()
@@ -0,0 +1,59 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import data_processing as dp
+
+
+def frame():
+    return pd.DataFrame({
+        'pH': [8.123456, np.nan, 7.9],
+        'flag': [2.0, 3.0, 2.0],
+        'small': [1.5e-05, 1e16, -0.0],
+        'temp': np.array([0.1, 17.347, np.nan], dtype='float32'),
+        'good': [True, False, True],
+        'smb_name': pd.Categorical(['SMB_A', 'SMB_B', None]),
+        'sample': ['1a', '', -999],
+        'EXPOCODE': ['06SN20201204'] * 3,
+        'date_time': pd.to_datetime(['2020-12-04 10:00:00', '2020-12-04 10:00:30', None]),
+        'day': pd.to_datetime(['2020-12-04', '2020-12-05', '2020-12-06']),
+        'Time_UTC': [datetime.time(8), datetime.time(10, 0, 30), None],
+        'station': pd.array([1, None, 3], dtype='Int64'),
+        'bottle': [1, 2, 3],
+    }, index=[5, 6, 7])
+
+
+@pytest.mark.parametrize('index', [False, True])
+def test_write_csv_text_is_pandas_text(tmp_path, index):
+    df = frame()
+    dp.write_csv(df, tmp_path / 'arrow.csv', precision={'pH': 4}, index=index)
+    df.round({'pH': 4}).to_csv(tmp_path / 'pandas.csv', index=index)
+    assert (tmp_path / 'arrow.csv').read_bytes() == (tmp_path / 'pandas.csv').read_bytes()
+
+
+@pytest.mark.parametrize('fields', [['x,y', 'z'], ['say "hi"', 'z'], ['two\nlines', 'z']])
+def test_write_csv_quotes_as_pandas(tmp_path, fields):
+    df = frame().iloc[:2].assign(sample=fields)
+    dp.write_csv(df, tmp_path / 'arrow.csv')
+    df.to_csv(tmp_path / 'pandas.csv', index=False)
+    assert (tmp_path / 'arrow.csv').read_bytes() == (tmp_path / 'pandas.csv').read_bytes()
+
+
+def test_write_csv_appends_chunks(tmp_path):
+    df = frame()
+    dp.write_csv(df, tmp_path / 'whole.csv')
+    dp.write_csv(df.iloc[:2], tmp_path / 'chunks.csv')
+    dp.write_csv(df.iloc[2:], tmp_path / 'chunks.csv', mode='a', header=False)
+    assert (tmp_path / 'chunks.csv').read_bytes() == (tmp_path / 'whole.csv').read_bytes()
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+def test_write_csv_floats_as_pandas(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    values = np.concatenate([10.0**rng.uniform(-8, 20, 5000),
+                             np.round(rng.uniform(-100, 100, 5000), 2), np.round(rng.uniform(-1e5, 1e5, 5000)),
+                             [0.0, -0.0, 1e-4, 1e6, 1e9, 1e15, 1e16, np.inf, -np.inf, np.nan]])
+    df = pd.DataFrame({'x': values.astype(dtype), 'y': -values.astype(dtype)})
+    dp.write_csv(df, tmp_path / 'arrow.csv')
+    df.to_csv(tmp_path / 'pandas.csv', index=False)
+    assert (tmp_path / 'arrow.csv').read_bytes() == (tmp_path / 'pandas.csv').read_bytes()
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import data_processing as dp
+
+
+def loaded():
+    n = 1000
+    return pd.DataFrame({
+        'filename': ['2020-12-11_163148_NAPTRAM2020'] * n,
+        'pH_cell': ['8.085'] * (n - 1) + ['<6.5'],
+        'temp_cell': ['17.347'] * (n - 1) + ['<6.5'],
+        'Silicate_flag': np.full(n, 2),
+    })
+
+
+def test_memory_report_measures_frame_as_loaded():
+    df = loaded()
+    report = dp.memory_report(df, dp.compact_dtypes(df))
+    before = df.memory_usage(index=False, deep=True)
+    np.testing.assert_array_equal(report['before'].drop('total'), before[report.index[:-1]])
+    assert report.loc['total', 'before'] == before.sum()
+    assert report.loc['Silicate_flag', 'ratio'] == 1
+    assert report.loc['total', 'ratio'] < 0.5
+
+
+def test_compact_dtypes_coerces_flagged_values():
+    compact = dp.compact_dtypes(loaded())
+    assert compact['temp_cell'].dtype == 'float32'
+    assert compact['temp_cell'].isnull().sum() == 1
+    assert compact['pH_cell'].dtype == object
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import data_processing as dp
+
+COLUMNS = ['pchip_salinity', 'salinity', 'flag_salinity']
+
+
+def smb_frame(seed=0, n=6000):
+    """SMB-like rows every 30 s, alternating pumps with an offset that
+    drifts, blank pump names and missing salinity."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2021-01-10', periods=n, freq='30s')
+    switches = np.sort(rng.choice(np.arange(50, n - 50), size=14, replace=False))
+    run = np.searchsorted(switches, np.arange(n), side='right')
+    names = np.where(run % 2 == 0, 'SMB_A', 'SMB_B').astype(object)
+    offset = 0.05 + 0.02 * np.sin(np.arange(n) / 700)
+    sal = 36 + np.where(names == 'SMB_A', 1, -1) * offset + rng.normal(0, 0.003, n)
+    names[rng.random(n) < 0.05] = ' '
+    sal[rng.random(n) < 0.01] = np.nan
+    return pd.DataFrame({'date_time': times.strftime('%Y-%m-%d %H:%M:%S'),
+                         'smb_name': names,
+                         'SBE45_sal': sal})
+
+
+def test_incremental_salinity_matches_batch():
+    df = smb_frame()
+    rng = np.random.default_rng(1)
+    incremental = dp.IncrementalSalinity()
+    stream, start, n_revised = None, 0, 0
+    while start < len(df):
+        # chunks both shorter and longer than the switch window
+        stop = start + int(rng.integers(1, 400))
+        rows = incremental.update(df.iloc[start:stop])
+        stream = rows if stream is None else pd.concat([stream, rows])
+        stream.loc[incremental.revised.index, COLUMNS] = incremental.revised[COLUMNS]
+        n_revised += len(incremental.revised)
+        start = stop
+    batch = dp.salinity(df)
+    assert n_revised > 0
+    pd.testing.assert_index_equal(stream.index, batch.index)
+    np.testing.assert_allclose(stream['pchip_salinity'], batch['pchip_salinity'], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(stream['salinity'], batch['salinity'], rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(stream['flag_salinity'], batch['flag_salinity'])
+
+
+def test_salinity_only_corrects_known_pumps():
+    df = smb_frame()
+    df.loc[df.index[::97], 'smb_name'] = 'SMB_C'
+    out = dp.salinity(df)
+    known = out['smb_name'].isin(['SMB_A', 'SMB_B'])
+    assert out.loc[~known, 'salinity'].isnull().all()
+    assert (out.loc[out['smb_name'] == 'SMB_C', 'flag_salinity'] == 9).all()
+    sign = np.where(out.loc[known, 'smb_name'] == 'SMB_A', -1, 1)
+    np.testing.assert_allclose(out.loc[known, 'salinity'],
+                               out.loc[known, 'SBE45_sal'] + sign * out.loc[known, 'pchip_salinity'])
@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+import data_processing as dp
+
+
+def _write_smb_log(fname, times):
+    # tab-separated like the ship's log: two lines after the header, 9999 as NA
+    lines = ['date time\tSBE45_sal\tsmb_name', 'unit\tpsu\t', 'format\tf\ts']
+    for i, time in enumerate(times):
+        lines.append('{}\t{}\t{}'.format(time.strftime('%Y/%m/%d %H:%M:%S'),
+                                         9999 if i == 3 else 35 + i / 100, 'PN1'))
+    with open(fname, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def test_convert_smb_twice_keeps_one_copy(tmp_path):
+    log = os.path.join(tmp_path, 'smb_all_hr.dat')
+    store = os.path.join(tmp_path, 'smb_store')
+    times = pd.date_range('2020-12-04 22:00', periods=10, freq='30min')
+    _write_smb_log(log, times)
+    dp.convert_smb(log, store, freq='D', chunksize=4)
+    first = dp.read_smb_store(store)
+    dp.convert_smb(log, store, freq='D', chunksize=6)
+    second = dp.read_smb_store(store)
+    assert len(first) == len(times)
+    pd.testing.assert_frame_equal(second, first)
+    assert second['SBE45_sal'].isnull().sum() == 1
+    catalogue = pd.read_csv(os.path.join(store, 'catalogue.csv'))
+    assert sorted(catalogue['file']) == sorted(f for f in os.listdir(store)
+                                               if f.endswith('.parquet'))
+
+
+def test_convert_smb_keeps_other_logs(tmp_path):
+    store = os.path.join(tmp_path, 'smb_store')
+    for name, start in [('smb_a', '2020-12-04'), ('smb_a_extra', '2020-12-06')]:
+        log = os.path.join(tmp_path, name + '.dat')
+        _write_smb_log(log, pd.date_range(start, periods=5, freq='h'))
+        dp.convert_smb(log, store)
+    dp.convert_smb(os.path.join(tmp_path, 'smb_a.dat'), store)
+    assert len(dp.read_smb_store(store)) == 10
+
+
+def test_convert_smb_adds_appended_rows(tmp_path):
+    log = os.path.join(tmp_path, 'smb_all_hr.dat')
+    store = os.path.join(tmp_path, 'smb_store')
+    times = pd.date_range('2020-12-04 20:00', periods=12, freq='h')
+    _write_smb_log(log, times[:6])
+    dp.convert_smb(log, store, chunksize=4)
+    assert dp.smb_store_current(log, store)
+    parts = set(os.listdir(store))
+
+    _write_smb_log(log, times)
+    os.utime(log, (0, os.path.getmtime(log) + 10))
+    assert not dp.smb_store_current(log, store)
+    added = dp.convert_smb(log, store, chunksize=4)
+    assert dp.smb_store_current(log, store)
+    # earlier parts are kept; only the hours after the last one are written
+    assert parts <= set(os.listdir(store))
+    assert added['start'].min() == times[6]
+    assert added['rows'].sum() == 6
+    smb = dp.read_smb_store(store)
+    pd.testing.assert_series_equal(smb['date time'], pd.Series(times, name='date time'),
+                                   check_freq=False)
+
+
+def test_convert_smb_takes_over_legacy_catalogue(tmp_path):
+    log = os.path.join(tmp_path, 'smb_all_hr.dat')
+    store = os.path.join(tmp_path, 'smb_store')
+    _write_smb_log(log, pd.date_range('2020-12-04', periods=5, freq='h'))
+    dp.convert_smb(log, store)
+    # catalogue of a store converted before the source was recorded
+    catalogue = os.path.join(store, 'catalogue.csv')
+    pd.read_csv(catalogue)[['file', 'start', 'end', 'rows']].to_csv(catalogue, index=False)
+    assert not dp.smb_store_current(log, store)
+    assert dp.convert_smb(log, store).empty
+    assert dp.smb_store_current(log, store)
+    assert len(dp.read_smb_store(store)) == 5
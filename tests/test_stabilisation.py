@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import data_processing as dp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Manual start-up cuts (sec) of processing_uws_pH_correction.py
+MANUAL_CUTS = {
+    '2020-12-11_163148_NAPTRAM2020': 3000,
+    '2020-12-15_214136_NAPTRAM20202': 20000,
+    '2020-12-17_134828_NAPTRAM20203': 6500,
+    '2020-12-20_182318_NAPTRAM20205': 10000,
+}
+
+
+@pytest.fixture(scope='module')
+def optode():
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        data_dict, file_list = dp.read_pyrosci('./data/pH/UWS/UWS_continuous_file_list.xlsx',
+                                               './data/pH/UWS')
+    finally:
+        os.chdir(cwd)
+    return pd.concat([data_dict[file] for file in sorted(file_list)], ignore_index=True)
+
+
+def test_transient_mask_matches_manual_cuts(optode):
+    transient = dp.transient_mask(optode)
+    cut = optode[transient].groupby('filename')['sec'].max()
+    for file, manual in MANUAL_CUTS.items():
+        assert manual / 2 <= cut[file] <= manual * 2, file
+    # never shorter than the fixed 20 min cut of logbook()
+    assert (cut.reindex(optode['filename'].unique()) >= 1200).all()
+
+
+def test_transient_mask_skips_flagged_values():
+    sec = np.arange(0, 6 * 3600, 30.)
+    pH = 8.1 - 0.05 * np.exp(-sec / 1800)
+    df = pd.DataFrame({'sec': sec, 'pH_cell': pH.round(4).astype(object)})
+    df.loc[[200, 400], 'pH_cell'] = '<6.5'
+    transient = dp.transient_mask(df, by=None)
+    assert transient.iloc[0] and not transient.iloc[-1]
+    # rows up to the end of the drift are flagged, without gaps
+    assert transient.sum() == transient.idxmin()
@@ -0,0 +1,20 @@
+import warnings
+import numpy as np
+import data_processing as dp
+
+
+def test_sampler_sizes():
+    assert dp.sampler_sizes('sobol', 100, 1000) == (128, 1024)
+    assert dp.sampler_sizes('sobol', 64, 256) == (64, 256)
+    assert dp.sampler_sizes('random', 100, 1000) == (100, 1000)
+
+
+def test_sobol_monte_carlo_without_balance_warnings():
+    sigma = np.array([1., 2., 3.])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        rmse, diagnostics = dp.monte_carlo_uncertainty(
+            lambda x: x, {'x': np.zeros(3)}, {'x': sigma}, n_iterations=1000,
+            block_size=100, sampler='sobol', seed=0, return_diagnostics=True)
+    assert diagnostics['n_iterations'] == 1024
+    np.testing.assert_allclose(rmse, sigma, rtol=0.02)